@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+@author: Benjamin Bemis Ph.D Student
+
+Throughput benchmark of the pressure acquisition pipeline using the simulated DAQ (ni_simulator).
+This runs on any computer, the NI driver and the chamber are not needed.
+
+Usage: python daq_benchmark.py [number of setpoints] [measure duration in s] [sample rate in Hz]
+"""
+import sys
+import time
+import numpy as np
+import ni_functions as ni
+import ni_simulator as sim
+
+n_setpoints = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+measure_duration = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+sample_rate = int(sys.argv[3]) if len(sys.argv) > 3 else int(1e3)
+
+trigger_channel = "port1/line0"
+channels = {"omega_channel" : "ai0", "mks_channel" : "ai3"}
+press_set_pts = np.linspace(100, 0.5, n_setpoints)
+
+# Each setpoint is held for the measurement duration, run as fast as possible
+hold_times = np.arange(n_setpoints + 1)*measure_duration
+sim.configure(pressure_source=lambda t: press_set_pts[np.minimum(np.searchsorted(hold_times, t, side="right") - 1, n_setpoints - 1)],
+              time_scale=0)
+ni.use_backend("simulated")
+ni.initialize()
+
+start = time.perf_counter()
+with ni.daq_session(channels, sample_rate) as session:
+    for p in press_set_pts:
+        ni.pressure_read(session.device_name, channels, trigger_channel, sample_rate, measure_duration, session=session)
+        ni.update()
+elapsed = time.perf_counter() - start
+
+n_samples = n_setpoints*int(measure_duration*sample_rate)
+print("="*50)
+print(f"Setpoints: {n_setpoints}, samples per channel: {n_samples}")
+print(f"Processing time: {elapsed:.3f} s ({n_samples/elapsed:.3e} samples/s per channel)")
+print(f"Record memory: {ni.memory_footprint()/1e6:.1f} MB")
+print(f"Max error of the combined pressure: {np.max(np.abs(ni.ni_vars.all_pressure_combined_kpa - press_set_pts)):.3f} kPa")
+print("="*50)
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+@author: Benjamin Bemis Ph.D Student
+
+This function list writes a calibration run to a single HDF5 file while it is being recorded.
+Each setpoint is appended to chunked, compressed datasets as soon as it is measured, so a crash
+only loses the setpoint in progress. export_mat() writes the omega.mat, mks.mat, pressure.mat and
+te.mat files used by the MATLAB processing from the run file.
+
+File layout
+-----------
+/raw/codes            (samples, channels) int16 ADC codes of every measurement, one after the other (int32 sums of
+                      the averaged codes when pressure_read keeps fewer samples than it reads), with the
+                      sensor of each column in its "channel_names" attribute and the scaling polynomial of
+                      each channel from codes to volts in its "scaling" attribute
+                      (/raw/voltage in volts instead if the blocks were read as voltages)
+/setpoints/range      (setpoints, 2) [start, stop) rows of the raw samples belonging to each setpoint
+/setpoints/<name>     summary of each setpoint (the ni_functions.SUMMARY_RECORDS, and PSD_RECORDS with the noise analysis on, without "all_"),
+                      including time_base, the (t0, rate, n) time axis of each measurement
+/psd_frequency        frequency of the bins of /setpoints/psd (written once, with the noise analysis on)
+/te/avg_temp          average TE temperature during each collection
+/te/times, /te/temps  TE temperature histories, one after the other
+/te/times_range       [start, stop) rows of /te/times belonging to each collection
+/te/temps_range       [start, stop) rows of /te/temps belonging to each collection (te_vars.temps keeps every
+                      reading, so it is longer than the steady state window in te_vars.times)
+/run/<name>           arrays describing the run (p_setpoints, t_setpoints, set_voltage, ...)
+"""
+import os
+import numpy as np
+from scipy.io import savemat
+import ni_functions as ni
+from storage_functions import expand_time_bases
+
+try:
+    import h5py
+except ImportError:
+    h5py = None         # only needed to write or export run files (pip install h5py)
+
+
+class run_writer:
+    """
+    Appends the measurements of a run to an HDF5 file as they are acquired.
+
+    Attach it to the DAQ functions with ni.add_sink(writer): pressure_read() then passes it every raw
+    block as it arrives and ni.update() passes it the summary of the setpoint. The file is flushed at the
+    end of every setpoint. TE readings are added with write_te() after te.update().
+
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+
+    Parameters
+    ----------
+    path : run file to create (an existing file is overwritten)
+    chunk_samples : number of samples per chunk of the raw datasets
+    compression : HDF5 compression filter ("gzip", "lzf" or None)
+    compression_opts : level of the gzip compression (0-9)
+    run_info : arrays describing the run saved under /run (for example p_setpoints=press_set_pts)
+    """
+    def __init__(self, path, chunk_samples=8192, compression="gzip", compression_opts=4, **run_info):
+        if h5py is None:
+            raise ImportError("h5py is needed to write the run file (pip install h5py)")
+        self.path = path
+        self.chunk_samples = int(chunk_samples)
+        self.compression = compression
+        self.compression_opts = compression_opts if compression == "gzip" else None
+        self.sample_rate = None
+        self.channel_names = None
+        self.scaling = None
+        self.raw = None
+        self.size = 0
+        self.setpoints = 0
+
+        self.file = h5py.File(path, "w")
+        self.write_run_info(**run_info)
+        self.file.flush()
+
+    def _dataset(self, name, row_shape, dtype, chunk_rows=256):
+        # Resizable along the first axis so setpoints can be appended
+        if name in self.file:
+            return self.file[name]
+        return self.file.create_dataset(name, shape=(0,) + tuple(row_shape), maxshape=(None,) + tuple(row_shape),
+                                        dtype=dtype, chunks=(chunk_rows,) + tuple(row_shape),
+                                        compression=self.compression, compression_opts=self.compression_opts)
+
+    def _append(self, name, values, dtype=np.float64, chunk_rows=256):
+        values = np.asarray(values, dtype=dtype)
+        if values.ndim == 0:
+            values = values.reshape(1)
+        dataset = self._dataset(name, values.shape[1:], dtype, chunk_rows)
+        n = len(dataset)
+        dataset.resize(n + len(values), axis=0)
+        dataset[n:] = values
+        return n, n + len(values)
+
+    def append(self, block):
+        """
+        Writes a raw block with the shape (channels, samples) of ADC codes (or voltages).
+        """
+        block = np.asarray(block)
+        if self.raw is None:
+            # the samples are kept in the type they are read in, codes are not converted to volts
+            if np.issubdtype(block.dtype, np.integer):
+                self.raw = self._dataset("raw/codes", (block.shape[0],), block.dtype, self.chunk_samples)
+            else:
+                self.raw = self._dataset("raw/voltage", (block.shape[0],), np.float64, self.chunk_samples)
+        n = block.shape[1]
+        self.raw.resize(self.size + n, axis=0)
+        self.raw[self.size:self.size + n] = block.T
+        self.size += n
+
+    def mark_setpoint(self, start, stop=None, summary=None):
+        """
+        Writes the sample range [start, stop) and the summary of a setpoint, then flushes the file.
+        Called by ni_functions.update().
+        """
+        if stop is None:
+            stop = self.size
+        self._append("setpoints/range", [[start, stop]], np.int64)
+        for name, value in (summary or {}).items():
+            # the per channel statistics are stored as one row per setpoint
+            self._append("setpoints/" + name, [value] if np.ndim(value) else value)
+        self.setpoints += 1
+        if self.sample_rate is not None:
+            self.file.attrs["sample_rate"] = self.sample_rate
+        if self.raw is not None:
+            if self.channel_names is not None:
+                self.raw.attrs["channel_names"] = list(self.channel_names)
+            if self.scaling is not None:
+                self.raw.attrs["scaling"] = np.asarray(self.scaling, dtype=np.float64)
+        if ni.ni_vars.summary_channels is not None:
+            self.file.attrs["summary_channels"] = list(ni.ni_vars.summary_channels)
+        if getattr(ni.ni_vars, "psd_frequency", None) is not None and "psd_frequency" not in self.file:
+            self.file.create_dataset("psd_frequency", data=ni.ni_vars.psd_frequency)
+        self.file.flush()
+
+    def write_te(self, te_vars, avg_temp_col):
+        """
+        Writes the TE readings of a collection (te_vars.times and te_vars.temps) and the average temperature.
+        """
+        times = np.ravel(np.asarray(te_vars.times, dtype=np.float64))
+        temps = np.ravel(np.asarray(te_vars.temps, dtype=np.float64))
+        self._append("te/times_range", [self._append("te/times", times, chunk_rows=1024)], np.int64)
+        self._append("te/temps_range", [self._append("te/temps", temps, chunk_rows=1024)], np.int64)
+        self._append("te/avg_temp", avg_temp_col)
+        self.file.flush()
+
+    def write_run_info(self, **run_info):
+        """
+        Saves (or replaces) arrays describing the run under /run, for example p_setpoints or set_voltage.
+        """
+        for name, value in run_info.items():
+            key = "run/" + name
+            if key in self.file:
+                del self.file[key]
+            self.file[key] = np.asarray(value)
+        self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_run(path):
+    """
+    Reads a run file written by run_writer into a dictionary of arrays.
+
+    Returns
+    -------
+    run : dictionary with the keys "voltage" (volts of every channel scaled from the stored codes), 
+          "channel_names" (sensor of each column of "voltage"), "range", "sample_rate", "setpoints" (summary arrays by name), 
+          "psd_frequency" (frequency of the bins of setpoints["psd"], None without the noise analysis), "te" (avg_temp, times, temps, times_range, temps_range) and "run" (run info arrays)
+    """
+    if h5py is None:
+        raise ImportError("h5py is needed to read the run file (pip install h5py)")
+    with h5py.File(path, "r") as file:
+        channel_names = ["omega", "mks"]
+        if "raw/codes" in file:
+            codes = file["raw/codes"][()]
+            scaling = file["raw/codes"].attrs["scaling"]
+            voltage = np.stack([ni.codes_to_volts(codes[:, row], scaling[row]) for row in range(codes.shape[1])], axis=1)
+            channel_names = list(file["raw/codes"].attrs.get("channel_names", channel_names))
+        elif "raw/voltage" in file:
+            voltage = file["raw/voltage"][()]
+            channel_names = list(file["raw/voltage"].attrs.get("channel_names", channel_names))
+        else:
+            voltage = np.zeros((0, 2))
+        run = {"voltage": voltage,
+               "channel_names": channel_names,
+               "sample_rate": file.attrs.get("sample_rate"),
+               "setpoints": {name: data[()] for name, data in file.get("setpoints", {}).items()},
+               "psd_frequency": file["psd_frequency"][()] if "psd_frequency" in file else None,
+               "te": {name: data[()] for name, data in file.get("te", {}).items()},
+               "run": {name: data[()] for name, data in file.get("run", {}).items()}}
+    run["range"] = run["setpoints"].pop("range", np.zeros((0, 2), dtype=np.int64))
+    return run
+
+
+def export_mat(path, savepath, pressure_layout=None):
+    """
+    Writes omega.mat, mks.mat and pressure.mat (and te.mat if TE readings were saved) from a run file,
+    with the same variables the scripts used to save at the end of a run.
+
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+
+    Parameters
+    ----------
+    path : run file written by run_writer
+    savepath : folder to write the .mat files to
+    pressure_layout : "sweep" (all_pressure_kpa, all_pressure_uncert, time) as saved by pressure_variation.py
+                      and psp_calibration_controls.py, or "regulator" (mean_*_kpa, time, set_voltage) as saved by
+                      regulator_response.py and read by plc_functions.get_set_voltage.
+                      Defaults to "regulator" if the run info has set_voltage.
+    """
+    run = read_run(path)
+    setpoints = run["setpoints"]
+    info = run["run"]
+    if pressure_layout is None:
+        pressure_layout = "regulator" if "set_voltage" in info else "sweep"
+
+    # Only the setpoints that were completed (the raw samples of a setpoint in progress are left out)
+    ranges = run["range"]
+    if len(ranges):
+        voltage = np.concatenate([run["voltage"][start:stop] for start, stop in ranges]).astype(np.float64)
+        if "time_base" in setpoints:
+            time = expand_time_bases(setpoints["time_base"])
+        else:
+            time = np.concatenate([np.arange(stop - start)/run["sample_rate"] for start, stop in ranges])
+    else:
+        voltage = np.zeros((0, 2))
+        time = np.zeros(0)
+    omega_voltage = voltage[:, run["channel_names"].index("omega")]
+    mks_voltage = voltage[:, run["channel_names"].index("mks")]
+    omega_kpa, mks_kpa, combined_pa, sigma_pa = ni.convert_block(omega_voltage, mks_voltage)
+
+    omega = {"pressure_kpa": omega_kpa,
+             "pressure_kpa_mean": setpoints.get("pressure_mean_omega", np.zeros(0)),
+             "time": time,
+             "voltage_raw": omega_voltage,
+             "voltage_raw_mean": setpoints.get("voltage_omega_mean", np.zeros(0))}
+    if "p_setpoints" in info:
+        omega["p_setpoints"] = info["p_setpoints"]
+    savemat(os.path.join(savepath, "omega.mat"), omega)
+
+    savemat(os.path.join(savepath, "mks.mat"), {
+                                              "pressure_mks_kpa": mks_kpa,
+                                              "pressure_kpa_mks_mean": setpoints.get("pressure_mean_mks", np.zeros(0)),
+                                              "mks_time": time,
+                                              "voltage_mks_raw": mks_voltage,
+                                              "voltage_raw_mks_mean": setpoints.get("voltage_mks_mean", np.zeros(0))
+                                              })
+
+    match pressure_layout:
+        case "sweep":
+            pressure = {"all_pressure_kpa": setpoints.get("pressure_combined_kpa", np.zeros(0)),
+                        "all_pressure_uncert": setpoints.get("pressure_combined_sigma_kpa", np.zeros(0)),
+                        "time": time}
+        case "regulator":
+            pressure = {"mean_omega_pressure_kpa": setpoints.get("pressure_mean_omega", np.zeros(0)),
+                        "mean_mks_pressure_kpa": setpoints.get("pressure_mean_mks", np.zeros(0)),
+                        "mean_combined_kpa": setpoints.get("pressure_combined_kpa", np.zeros(0)),
+                        "mean_combined_sigma_kpa": setpoints.get("pressure_combined_sigma_kpa", np.zeros(0)),
+                        "time": time,
+                        "set_voltage": info.get("set_voltage", np.zeros(0))}
+        case _:
+            raise ValueError(f"Unknown pressure layout: {pressure_layout}")
+    savemat(os.path.join(savepath, "pressure.mat"), pressure)
+
+    te = run["te"]
+    if "avg_temp" in te:
+        te_mat = {"times_te": te["times"],
+                  "temps_te": te["temps"],
+                  "te_average_temps": te["avg_temp"]}
+        if "t_setpoints" in info:
+            te_mat["t_setpoints"] = info["t_setpoints"]
+        savemat(os.path.join(savepath, "te.mat"), te_mat)
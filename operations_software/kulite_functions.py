@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+@author: Benjamin Bemis Ph.D Student
+
+This function list calibrates a Kulite from oscilloscope captures, the Python version of kuliteDataAnalysis.m.
+Each setpoint of a pressure_variation.py run is captured on the scope as a trace file
+(C1--kulite_test_calibration_mean_2sec--00000.txt, ...) with a few header lines followed by "time,voltage" rows.
+The traces are parsed with the C reader of NumPy (np.loadtxt), in a pool of processes for large batches,
+only the statistics of each trace are sent back, and the mean voltages are fit against the mean pressure
+of each setpoint saved by the run (omega.mat or run.h5).
+"""
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.io
+
+try:
+    import h5py
+except ImportError:
+    h5py = None         # only needed to read the pressures from a run.h5 file (pip install h5py)
+
+
+# Constants (kuliteDataAnalysis.m)
+psi_to_kpa = 6.89475728
+reading_voltage = 0.00005           # reading uncertainty of the scope in V
+reading_pressure = 0.00005          # reading uncertainty of the pressure in kPa
+systematic_voltage = 0.0017         # 1.7% of reading
+systematic_pressure = 0.0008        # 0.08% of reading
+
+
+def scope_files(folder, pattern="C1--*.txt"):
+    """
+    Returns the scope trace files in a folder sorted by their capture number (the digits at the end of the name),
+    so the n-th file belongs to the n-th setpoint of the run.
+    """
+    def capture_number(path):
+        number = re.search(r"(\d+)\.\w+$", os.path.basename(path))
+        return (int(number.group(1)) if number else -1, path)
+    return sorted(glob.glob(os.path.join(folder, pattern)), key=capture_number)
+
+
+def _header_rows(path, max_rows=100):
+    # Counts the lines before the first "time,voltage" row that is numeric
+    with open(path, "r", errors="replace") as file:
+        for row, line in enumerate(file):
+            if row >= max_rows:
+                break
+            fields = line.split(",")
+            if len(fields) >= 2:
+                try:
+                    float(fields[0])
+                    float(fields[1])
+                    return row
+                except ValueError:
+                    pass
+    raise ValueError(f"No time,voltage rows found in {path}")
+
+
+def read_scope_trace(path, skip_rows=None):
+    """
+    Reads the time and voltage columns of one scope trace file.
+
+    Parameters
+    ----------
+    path : trace file
+    skip_rows : number of header lines, None finds the first numeric row
+
+    Returns
+    -------
+    time : sample times in seconds
+    voltage : voltage of each sample
+    """
+    if skip_rows is None:
+        skip_rows = _header_rows(path)
+    data = np.loadtxt(path, delimiter=",", skiprows=skip_rows, usecols=(0, 1), ndmin=2)
+    return data[:, 0], data[:, 1]
+
+
+def _trace_stats(args):
+    # Worker of read_scope_traces: only the statistics (and the voltage if asked) go back to the main process
+    path, skip_rows, keep_voltage = args
+    time, voltage = read_scope_trace(path, skip_rows)
+    stats = {"mean": np.mean(voltage),
+             "std": np.std(voltage, ddof=1) if len(voltage) > 1 else 0.0,
+             "count": len(voltage),
+             "duration": time[-1] - time[0] if len(time) else 0.0}
+    if keep_voltage:
+        stats["voltage"] = voltage
+    return stats
+
+
+def read_scope_traces(paths, skip_rows=None, keep_voltage=False, processes=None, min_parallel=8):
+    """
+    Reads a batch of scope trace files and returns the statistics of each one.
+
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+
+    Parameters
+    ----------
+    paths : trace files in setpoint order (see scope_files)
+    skip_rows : number of header lines, None finds the first numeric row of each file
+    keep_voltage : also return the voltage samples of each trace
+    processes : number of worker processes, None uses all the cores
+    min_parallel : batches smaller than this are read in this process (starting the pool costs more than it saves)
+
+    Returns
+    -------
+    traces : dictionary with the arrays "mean", "std", "count" and "duration" (one value per file)
+             and "voltage" (list of the samples of each file) if keep_voltage
+    """
+    jobs = [(path, skip_rows, keep_voltage) for path in paths]
+    if processes == 1 or len(jobs) < min_parallel:
+        results = [_trace_stats(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_trace_stats, jobs, chunksize=max(1, len(jobs)//(4*(processes or os.cpu_count() or 1)))))
+
+    traces = {name: np.array([result[name] for result in results]) for name in ("mean", "std", "count", "duration")}
+    if keep_voltage:
+        traces["voltage"] = [result["voltage"] for result in results]
+    return traces
+
+
+def setpoint_pressures(path, name=None):
+    """
+    Returns the mean pressure (kPa) of each setpoint saved by a run.
+
+    Parameters
+    ----------
+    path : omega.mat (pressure_kpa_mean, as used by kuliteDataAnalysis.m), pressure.mat (all_pressure_kpa) or run.h5
+    name : variable to use instead of the default one of the file
+    """
+    if path.endswith(".h5"):
+        if h5py is None:
+            raise ImportError("h5py is needed to read the run file (pip install h5py)")
+        with h5py.File(path, "r") as file:
+            return np.ravel(file["setpoints/" + (name or "pressure_mean_omega")][()])
+    data = scipy.io.loadmat(path)
+    if name is None:
+        name = "pressure_kpa_mean" if "pressure_kpa_mean" in data else "all_pressure_kpa"
+    return np.ravel(data[name])
+
+
+def kulite_calibration(mean_voltages, mean_pressures_kpa, fit_points=slice(1, 10)):
+    """
+    Linear fit of pressure against Kulite voltage with the uncertainty of kuliteDataAnalysis.m.
+
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+
+    Parameters
+    ----------
+    mean_voltages : mean voltage of each setpoint
+    mean_pressures_kpa : mean chamber pressure of each setpoint (same order)
+    fit_points : setpoints used in the fit, the default drops the ends as in kuliteDataAnalysis.m (points 2:10)
+
+    Returns
+    -------
+    calibration : dictionary with
+                  "slope" (kPa/V) and "offset" (pressure at 0 V in kPa),
+                  "slope_sigma" and "offset_sigma" (standard errors of the least squares fit, nan with fewer than 4 points),
+                  "voltage", "pressure_kpa" (points of the fit), "uncertainty_voltage", "uncertainty_pressure" (of each point)
+                  and "slope_error" (propagated reading uncertainty of the slope at each point, Rumbach p. 144)
+    """
+    mean_voltages = np.asarray(mean_voltages, dtype=np.float64)
+    mean_pressures_kpa = np.asarray(mean_pressures_kpa, dtype=np.float64)
+    n = min(len(mean_voltages), len(mean_pressures_kpa))
+    if len(mean_voltages) != len(mean_pressures_kpa):
+        print(f"{len(mean_voltages)} captures and {len(mean_pressures_kpa)} setpoints, using the first {n} of each.")
+    voltage = mean_voltages[:n][fit_points]
+    pressure = mean_pressures_kpa[:n][fit_points]
+
+    if len(voltage) > 3:
+        (slope, offset), cov = np.polyfit(voltage, pressure, 1, cov=True)
+        slope_sigma, offset_sigma = np.sqrt(np.diag(cov))
+    else:
+        slope, offset = np.polyfit(voltage, pressure, 1)
+        slope_sigma = offset_sigma = np.nan
+
+    # Uncertainty
+    mean_voltage = abs(np.mean(voltage))
+    mean_pressure = np.mean(pressure)
+    drift_voltage = voltage - mean_voltage
+    drift_pressure = pressure - mean_pressure
+    uncertainty_voltage = np.sqrt(drift_voltage**2 + reading_voltage**2 + (systematic_voltage*voltage)**2)
+    uncertainty_pressure = np.sqrt(drift_pressure**2 + reading_pressure**2 + (systematic_pressure*pressure)**2)
+    slope_error = mean_pressure/mean_voltage*np.sqrt((uncertainty_pressure/mean_pressure)**2 + (uncertainty_voltage/mean_voltage)**2)
+
+    return {"slope": slope, "offset": offset,
+            "slope_sigma": slope_sigma, "offset_sigma": offset_sigma,
+            "voltage": voltage, "pressure_kpa": pressure,
+            "uncertainty_voltage": uncertainty_voltage, "uncertainty_pressure": uncertainty_pressure,
+            "slope_error": slope_error}
+
+
+def calibrate_kulite(captures, pressure_file, fit_points=slice(1, 10), pressure_name=None, processes=None, plot=False):
+    """
+    Reads the scope captures of a run, joins them with the setpoint pressures and fits the Kulite calibration.
+
+    Parameters
+    ----------
+    captures : folder with the trace files, or a list of the files in setpoint order
+    pressure_file : omega.mat, pressure.mat or run.h5 of the run
+    fit_points : setpoints used in the fit (see kulite_calibration)
+    pressure_name : variable of pressure_file to use (see setpoint_pressures)
+    processes : number of worker processes for reading the captures
+    plot : plot the points, the fit and the uncertainty
+
+    Returns
+    -------
+    calibration : see kulite_calibration, with "traces" (see read_scope_traces) added
+    """
+    paths = scope_files(captures) if isinstance(captures, str) else list(captures)
+    traces = read_scope_traces(paths, processes=processes)
+    calibration = kulite_calibration(traces["mean"], setpoint_pressures(pressure_file, pressure_name), fit_points)
+    calibration["traces"] = traces
+
+    print(f"slope: {calibration['slope']} kPa/V (+/- {calibration['slope_sigma']})")
+    print(f"Pressure at 0V {calibration['offset']} kPa (+/- {calibration['offset_sigma']})")
+    print(f"Slope error: {calibration['slope_error']}")
+
+    if plot:
+        import matplotlib.pyplot as plt
+        voltage, pressure = calibration["voltage"], calibration["pressure_kpa"]
+        plt.figure()
+        plt.plot(voltage, pressure, "o", label="Kulite")
+        plt.plot(voltage, calibration["slope"]*voltage + calibration["offset"], label="polyfit")
+        plt.errorbar(voltage, pressure, yerr=calibration["uncertainty_pressure"], fmt="none", label="Uncertainty in Pressure")
+        plt.errorbar(voltage, pressure, xerr=calibration["uncertainty_voltage"], fmt="none", label="Uncertainty in Voltage")
+        plt.xlabel("Voltage, V")
+        plt.ylabel("Chamber Pressure, kPa")
+        plt.legend(loc="lower right")
+        plt.show()
+    return calibration
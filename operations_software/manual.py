@@ -195,20 +195,9 @@ time.sleep(15)
 #=============================================================================
 #       Completed block for automated camera and laser triggering
 
-time_elapse = 0
-# print("Turn on the Laser! and prep the camera")
-start = time.time()
-while time_elapse < delay:
-    print(f"You have {(delay)-time_elapse} seconds till collection begins")
-    print(50*"=")
-    time.sleep(1)
-    time_elapse = int(time.time()-start)
-    if delay - time_elapse == laser_pretrig:
-        plc.ttl_pulse(laser,status = "on")
-        print("Laser triggered. \n")
-    elif delay - time_elapse == camera_pretrig:
-        plc.ttl_pulse(camera, status = "on")
-        print("Camera triggered. \n")
+# Countdown with the laser and the camera triggered at their pretrigger times (the PLC writes do not hold up the countdown)
+plc.pretrigger(delay, {laser_pretrig: lambda: plc.ttl_pulse_async(laser, "on"),
+                       camera_pretrig: lambda: plc.ttl_pulse_async(camera, "on")})
       
 
 print("Collection has begun:")
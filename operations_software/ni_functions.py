@@ -7,11 +7,21 @@ Advisor: Thomas Juliano
 
 This function list defines functions for use with the NIDAQ
 """
-import nidaqmx as nidaq
+try:
+    import nidaqmx as nidaq
+    from nidaqmx.stream_readers import AnalogMultiChannelReader, AnalogUnscaledReader
+except ImportError: # No NI driver on this computer, use_backend("simulated") can be used instead
+    nidaq = None
+    AnalogMultiChannelReader = None
+    AnalogUnscaledReader = None
+import queue
+from fractions import Fraction
+import threading
 import time
 import numpy as np
-from scipy.interpolate import interp1d
-from scipy.interpolate import CubicSpline # Currently not used
+from scipy.interpolate import CubicSpline
+from storage_functions import sample_store, raw_spool, time_base, expand_time_bases
+from stats_functions import online_stats, welch_psd
 
 """ 
 Notes:
@@ -41,14 +51,15 @@ class ni_vars:
         self.raw_voltage = None
         self.mks_raw_voltage = None
 
-        self.all_times_omega = None
-        self.all_times_mks = None
-        self.all_pressure_omega = None
-        self.all_pressure_mks = None
+        self.all_time_base = None
+        self.codes = None
+        self.sensors = None
+        self.scaling = None
+        self.summary_channels = None
+        self.all_codes_omega = None
+        self.all_codes_mks = None
         self.all_pressure_mean_omega = None
         self.all_pressure_mean_mks = None
-        self.all_voltage_omega = [None]
-        self.all_voltage_mks = [None]
         self.all_voltage_omega_mean = None
         self.all_voltage_mks_mean = None
         
@@ -56,100 +67,356 @@ class ni_vars:
         self.pressure_combined_sigma_kpa = None
         self.all_pressure_combined_kpa = None
         self.all_pressure_combined_sigma_kpa = None
+        self.trigger_index = None
+        self.stores = {}
+        self.record_mode = "raw"
+        self.stats = None
+        self.options = {}
+        self.psd = None
+        self.psd_frequency = None
+        self.spool = None
+        self.run_writer = None
+        self.sinks = []
+        self.sink_ranges = []
         
         self.device_name = local_sys()
         
-def initialize():
+# Records that are accumulated over a run by update(). Each one is kept in a sample_store and the
+# ni_vars attribute of the same name is a zero-copy view of the store.
+# RAW_RECORDS hold every sample and are only kept when the record mode is "raw". They are the unscaled 
+# int16 ADC codes (int32 sums of the averaged codes with pressure_read(output_rate=...), see decimate_codes), 
+# use all_voltages() and all_pressures() to scale them (with the coefficients in ni_vars.scaling).
+# Sensors other than the Omega and MKS get an all_codes_<name> record of their own when they are first read.
+RAW_RECORDS = ["all_codes_omega", "all_codes_mks"]
+SUMMARY_RECORDS = [
+    "all_pressure_mean_omega", "all_voltage_omega_mean",
+    "all_pressure_mean_mks", "all_voltage_mks_mean",
+    "all_pressure_combined_kpa", "all_pressure_combined_sigma_kpa",
+    "all_sample_count", "all_time_base", "all_trigger_index", "all_summary_mean", "all_summary_std", "all_summary_min", "all_summary_max",
+    ]
+STORED_RECORDS = RAW_RECORDS + SUMMARY_RECORDS
+
+# Quantities tracked by the per setpoint statistics (rows of ni_vars.stats and of the all_summary_* records)
+# with the Omega and MKS on the task. Every extra sensor adds a <name>_voltage and a <name>_<units> row, 
+# and a <name>_sigma_<units> row if it has an uncertainty (ni_vars.summary_channels has the rows of the last measurement).
+SUMMARY_CHANNELS = ["omega_voltage", "mks_voltage", "omega_kpa", "mks_kpa", "omega_sigma_kpa", "mks_sigma_kpa", "combined_kpa", "combined_sigma_kpa"]
+
+# Records added to the summary of each setpoint when the noise analysis is on (initialize(psd_segment_length=...)). 
+# The spectra and the noise floor are of the voltage of each channel (the first rows of ni_vars.summary_channels), 
+# see stats_functions.welch_psd. The frequency of the bins is the same at every setpoint, it is kept once in ni_vars.psd_frequency.
+PSD_RECORDS = ["all_psd", "all_noise_floor", "all_noise_rms", "all_line_rms", "all_peak_frequency"]
+
+# Rows preallocated by the per setpoint records, they double when a run has more setpoints 
+# (a row of all_psd is channels x frequency bins, so 1024 of them would be tens of MB)
+SETPOINT_CAPACITY = 16
+
+def initialize(record_mode="raw", spool_path=None, spool_dtype="int16", spool_capacity=int(1e6),
+               psd_segment_length=None, line_frequency=60.0, settle_mode="fixed", target_sem_kpa=None, 
+               run_file=None, start_trigger=None, cycle_average=False, oversample=False):
     """
     This function is used to initilize the class variables for data storage. 
     It can also be used to clear existing data stored in the defined variables.
     
     Author: Luke Denn 
     Editor: Benjamin Bemis
-    Updated: 2/4/2026
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    record_mode : "raw" keeps the summary of each setpoint plus every sample as int16 ADC codes 
+                  (scaled to volts and pressures when asked for with all_voltages() and all_pressures()). 
+                  "summary" keeps only the per setpoint statistics (count, mean, std, min and max of ni_vars.summary_channels) 
+                  so the memory used does not grow with the measurement duration. 
+    spool_path : if given, every raw block is also written to this memory-mapped file as it arrives 
+                 (see storage_functions.raw_spool), with the sample range of each setpoint in its index. 
+                 With record_mode="summary" this keeps long recordings out of RAM. Call close_spool() at the end of the run.
+    spool_dtype : data type of the spool file ("int16" ADC codes with the scaling in the index, or "float32"/"float64" 
+                  volts, scaled from the codes as they are written)
+    spool_capacity : number of samples per channel to preallocate in the spool file
+    psd_segment_length : if given, the Welch power spectral density of every channel is accumulated over the blocks 
+                         of each measurement with segments of this many samples (frequency resolution 
+                         sample_rate/psd_segment_length) and saved with the summary of the setpoint (PSD_RECORDS). 
+                         The raw samples are not needed for it, so it also works with record_mode="summary".
+    line_frequency : mains frequency (Hz) used for the line pickup in the noise summary (and by cycle_average)
+    
+    The optional acquisition features below are all off by default. The calibration scripts only call initialize(), 
+    switch a feature on by passing it here:
+    settle_mode : "fixed" waits the full time after a pressure change, "adaptive" moves on as soon as the 
+                  pressure is steady (see settle and wait_for_settle)
+    target_sem_kpa : stop each measurement once the standard error of the combined pressure is below this (kPa), 
+                     the measurement duration is then the maximum (see pressure_read)
+    run_file : if given, the run is also written to this HDF5 file as it is measured 
+               (hdf5_functions.run_writer in ni_vars.run_writer). Call close_run_file() at the end of the run.
+    start_trigger : input of a hardware start trigger ("PFI0", the only one on the USB-6009). Every measurement then 
+                    starts on the rising edge at this input (see arm_trigger)
+    cycle_average : round every measurement to whole cycles of line_frequency so the mains pickup averages out
+    oversample : sample at the highest rate of the DAQ and average down to the sample rate of the script 
+                 as it is read (see acquisition_rate and plan_sampling)
+    
+    Other writers (for example hdf5_functions.run_writer) can be attached with add_sink() after this is called.
 
     Returns
     -------
     None.
 
     """    
-
-    ni_vars.all_times_omega = np.array([])
-    ni_vars.all_pressure_omega = np.array([])
-    ni_vars.all_pressure_mean_omega = np.array([])
-    ni_vars.all_voltage_omega = np.array([])
-    ni_vars.all_voltage_omega_mean = np.array([])
+    if record_mode not in ("raw", "summary"):
+        raise ValueError(f"Unknown record mode: {record_mode}")
+    ni_vars.record_mode = record_mode
+    ni_vars.stores = {name: sample_store(np.int16) for name in RAW_RECORDS}
+    ni_vars.stores.update({name: sample_store(capacity=SETPOINT_CAPACITY) for name in SUMMARY_RECORDS})
+    ni_vars.psd_settings = None
+    ni_vars.psd = None
+    ni_vars.psd_frequency = None
+    ni_vars.stores.update({name: sample_store(capacity=SETPOINT_CAPACITY) for name in PSD_RECORDS})     # stay empty with the noise analysis off
+    if psd_segment_length is not None:
+        ni_vars.psd_settings = {"segment_length": int(psd_segment_length), "line_frequency": line_frequency}
+    ni_vars.scaling = None
+    ni_vars.sensors = None
+    _refresh_views()
+    
+    ni_vars.spool = None
+    ni_vars.sinks = []
+    ni_vars.sink_ranges = []
+    # the spool is made by the first pressure_read, once the channels on the task are known
+    ni_vars.spool_settings = None if spool_path is None else {"path": spool_path, "dtype": spool_dtype, "capacity": spool_capacity}
     
-    ni_vars.all_times_mks = np.array([])
-    ni_vars.all_pressure_mks = np.array([])
-    ni_vars.all_pressure_mean_mks = np.array([])
-    ni_vars.all_voltage_mks = np.array([])
-    ni_vars.all_voltage_mks_mean = np.array([])
+    if settle_mode not in ("fixed", "adaptive"):
+        raise ValueError(f"Unknown settle mode: {settle_mode}")
+    ni_vars.options = {"settle_mode": settle_mode,
+                       "target_sem_kpa": target_sem_kpa,
+                       "start_trigger": start_trigger,
+                       "line_frequency": line_frequency if cycle_average else None,
+                       "oversample": oversample}
+    ni_vars.run_writer = None
+    if run_file is not None:
+        import hdf5_functions       # imports this module, so only when a run file is asked for
+        ni_vars.run_writer = hdf5_functions.run_writer(run_file)
+        add_sink(ni_vars.run_writer)
     
-    ni_vars.all_pressure_combined_kpa = np.array([])
-    ni_vars.all_pressure_combined_sigma_kpa = np.array([])
+def add_sink(sink):
+    """
+    Attaches a writer that receives the raw blocks of every measurement as they arrive.
+    
+    A sink needs a size attribute (samples written so far), append(block) taking the int16 ADC codes 
+    (int32 sums of the averaged codes with pressure_read(output_rate=...)) with the shape (channels, samples), 
+    and mark_setpoint(start, stop, summary) which update() calls with the sample range of the setpoint and a dictionary of its summary values (the SUMMARY_RECORDS 
+    without the "all_" prefix). pressure_read sets the sample_rate, channel_names (sensor names) and 
+    scaling (codes to volts polynomial of each channel) attributes of the sink before the first block.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    """
+    if sink not in ni_vars.sinks:
+        ni_vars.sinks.append(sink)
+    
+def close_spool():
+    """
+    Closes the raw sample spool (if one was opened by initialize) so it can be read with storage_functions.open_spool().
+    """
+    if ni_vars.spool is not None:
+        ni_vars.spool.close()
+        ni_vars.sinks.remove(ni_vars.spool)
+        ni_vars.spool = None
+    ni_vars.spool_settings = None
+    
+def close_run_file():
+    """
+    Closes the HDF5 run file (if one was opened by initialize) so it can be read with hdf5_functions.read_run().
+    """
+    if ni_vars.run_writer is not None:
+        ni_vars.run_writer.close()
+        ni_vars.sinks.remove(ni_vars.run_writer)
+        ni_vars.run_writer = None
+    
+def _refresh_views():
+    for name, store in ni_vars.stores.items():
+        setattr(ni_vars, name, store.view())
+    
+    # Names used by the older scripts for the combined pressure
+    ni_vars.all_pressure_weightedAvg_kpa = ni_vars.all_pressure_combined_kpa
+    ni_vars.all_pressure_weighted_uncert_kpa = ni_vars.all_pressure_combined_sigma_kpa
     
 def update():
-    ni_vars.all_times_omega = np.concatenate([ni_vars.all_times_omega, ni_vars.time_vector], axis=0)
-    ni_vars.all_pressure_omega = np.concatenate([ni_vars.all_pressure_omega, ni_vars.pressure_kpa], axis=0)
-    ni_vars.all_pressure_mean_omega = np.concatenate([ni_vars.all_pressure_mean_omega, np.array([ni_vars.pressure_kpa_mean])], axis=0)
-    ni_vars.all_voltage_omega = np.concatenate([ni_vars.all_voltage_omega, ni_vars.raw_voltage], axis=0)
+    """
+    Appends the last measurement (written to ni_vars by pressure_read) to the run records.
     
-    ni_vars.all_times_mks = np.concatenate([ni_vars.all_times_mks, ni_vars.mks_time_vector], axis=0)
-    ni_vars.all_pressure_mks = np.concatenate([ni_vars.all_pressure_mks, ni_vars.mks_pressure_kpa], axis=0)
-    ni_vars.all_pressure_mean_mks = np.concatenate([ni_vars.all_pressure_mean_mks, np.array([ni_vars.mks_pressure_kpa_mean])], axis=0)
-    ni_vars.all_voltage_mks = np.concatenate([ni_vars.all_voltage_mks, ni_vars.mks_raw_voltage], axis=0)
+    Author: Luke Denn 
+    Editor: Benjamin Bemis
+    Updated: 10/18/2026
+    """
+    stores = ni_vars.stores
+    if ni_vars.record_mode == "raw":
+        for name, codes in ni_vars.codes.items():
+            store = stores.get("all_codes_" + name)
+            if store is None or (len(store) == 0 and store.dtype != codes.dtype):
+                # int16 codes, or the int32 sums of decimate_codes when pressure_read averages with output_rate
+                store = stores["all_codes_" + name] = sample_store(codes.dtype)
+            elif store.dtype != codes.dtype:
+                raise ValueError(f"The {name} records hold {store.dtype} samples, pressure_read gave {codes.dtype} "
+                                 "(use the same output_rate decimation for every setpoint of a run)")
+            store.append(codes)
     
-    ni_vars.all_voltage_omega_mean = np.concatenate([ni_vars.all_voltage_omega_mean, np.array([np.mean(ni_vars.raw_voltage)])], axis=0)
-    ni_vars.all_voltage_mks_mean = np.concatenate([ni_vars.all_voltage_mks_mean, np.array([np.mean(ni_vars.mks_raw_voltage)])], axis=0)
+    stats = ni_vars.stats
+    summary = {"pressure_mean_omega": ni_vars.pressure_kpa_mean,
+               "voltage_omega_mean": stats.mean[ni_vars.summary_channels.index("omega_voltage")],
+               "pressure_mean_mks": ni_vars.mks_pressure_kpa_mean,
+               "voltage_mks_mean": stats.mean[ni_vars.summary_channels.index("mks_voltage")],
+               "pressure_combined_kpa": ni_vars.pressure_combined_kpa,
+               "pressure_combined_sigma_kpa": ni_vars.pressure_combined_sigma_kpa,
+               "sample_count": stats.count,
+               "time_base": ni_vars.time_vector.as_row(),
+               "trigger_index": -1 if ni_vars.trigger_index is None else ni_vars.trigger_index,
+               "summary_mean": stats.mean,
+               "summary_std": stats.std,
+               "summary_min": stats.min,
+               "summary_max": stats.max}
+    if ni_vars.psd is not None:
+        ni_vars.psd_frequency = ni_vars.psd.frequency
+        summary["psd"] = ni_vars.psd.psd
+        summary.update(ni_vars.psd.noise_summary(ni_vars.psd_settings["line_frequency"]))
+    for name, value in summary.items():
+        # the per channel statistics are stored as one row per setpoint
+        stores["all_" + name].append([value] if np.ndim(value) else value)
     
-    ni_vars.all_pressure_weightedAvg_kpa = np.concatenate([ni_vars.all_pressure_combined_kpa, np.array([ni_vars.pressure_combined_kpa])], axis=0)
-    ni_vars.all_pressure_weighted_uncert_kpa = np.concatenate([ni_vars.all_pressure_combined_sigma_kpa, np.array([ni_vars.pressure_combined_sigma_kpa])], axis=0)
+    for sink, start, stop in ni_vars.sink_ranges:
+        sink.mark_setpoint(start, stop, summary)
+    ni_vars.sink_ranges = []
+    
+    _refresh_views()
+
+def all_sensor_data(name):
+    """
+    Returns the voltage and the converted value (in the units of the sensor) of every recorded sample 
+    of one sensor, scaled from its stored ADC codes.
+    """
+    definition = next(definition for definition in ni_vars.sensors if definition.name == name)
+    codes = getattr(ni_vars, "all_codes_" + name)
+    voltage, value = scale_codes(np.asarray(codes)[None], [definition], [ni_vars.scaling[name]])
+    return voltage[0], value[0]
+
+def all_voltages():
+    """
+    Returns the Omega and MKS voltages of every recorded sample, scaled from the stored ADC codes.
+    """
+    return all_sensor_data("omega")[0], all_sensor_data("mks")[0]
+
+def all_pressures():
+    """
+    Returns the Omega and MKS pressures (kPa) of every recorded sample, converted from the stored ADC codes.
+    """
+    return all_sensor_data("omega")[1], all_sensor_data("mks")[1]
+
+def all_times():
+    """
+    Returns the time of every recorded sample (one measurement after the other, each starting at 0 s) 
+    made from the (t0, rate, n) rows in ni_vars.all_time_base. The times are not stored during the run.
+    """
+    return expand_time_bases(ni_vars.all_time_base)
+
+def memory_footprint():
+    """
+    Returns the memory (in bytes) allocated for the run records.
+    """
+    return sum(store.nbytes for store in ni_vars.stores.values())
 
         
 # DAQ Functions 
-def local_sys():
+def use_backend(backend):
+    """
+    Selects the DAQ backend used by every function in this file.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    backend : "nidaqmx" for the real hardware (default), "simulated" for ni_simulator, 
+              or any module that provides the same subset of nidaqmx.
+    """
+    global nidaq, AnalogMultiChannelReader, AnalogUnscaledReader
+    match backend:
+        case "nidaqmx":
+            import nidaqmx as module
+            import nidaqmx.stream_readers
+        case "simulated":
+            import ni_simulator as module
+        case _:
+            module = backend
+    nidaq = module
+    AnalogMultiChannelReader = module.stream_readers.AnalogMultiChannelReader
+    AnalogUnscaledReader = module.stream_readers.AnalogUnscaledReader
+    
+
+def list_devices():
+    """
+    Returns the name, product type and serial number of every DAQ connected to the computer.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    """
+    system = nidaq.system.System.local()
+    return [{"name": device.name, "product_type": device.product_type, "serial_number": device.serial_num}
+            for device in system.devices]
+
+
+def local_sys(product_type=None, serial_number=None):
     """
     NIDAQ function for use with the USB DAQs
     purpose: accurate caputure of device information
     inputs: device 
     outputs: device_name
+    
+    Updated: 10/18/2026 - the device can be picked by product type ("USB-6009") and/or serial number 
+                          (as an int or a hex string like "0x01A2B3C4"). If more than one device matches, 
+                          the first one by name is used and the others are printed, instead of silently 
+                          returning the last device that was listed.
 
     """
-    system = nidaq.system.System.local()
-
-    for device in system.devices:
-        device_name = device.name
+    if isinstance(serial_number, str):
+        serial_number = int(serial_number, 0)
+    devices = sorted(list_devices(), key=lambda device: device["name"])
+    matches = [device for device in devices 
+               if (product_type is None or device["product_type"] == product_type) 
+               and (serial_number is None or device["serial_number"] == serial_number)]
+    if not matches:
+        raise RuntimeError(f"No DAQ found (product type {product_type}, serial number {serial_number}). Connected: {devices}")
+    if len(matches) > 1:
+        print(f"Found {len(matches)} DAQs, using {matches[0]['name']}. Pick one with local_sys(product_type=..., serial_number=...):")
+        for device in matches:
+            print(f"    {device['name']}: {device['product_type']}, serial number {device['serial_number']:#X}")
+    device_name = matches[0]["name"]
     
     return(device_name)
 
 
 
-def record(device_name, channel,trigger_channel, sample_rate, duration):
+def record(device_name, channel,trigger_channel, sample_rate, duration, triggered=False, trigger_timeout=60):
     """
     NIDAQ function for use with the USB DAQs
     purpose: opens channels on DAQ for recording in the continous mode. Records data for the specified duration at the specified sample rate. 
     inputs: device 
     outputs: device_name
+    
+    Updated: 10/18/2026 - if triggered is True the recording starts on the rising edge at trigger_channel 
+                          (hardware start trigger, see configure_start_trigger). The read waits up to 
+                          trigger_timeout seconds for the edge.
+                        - the time vector is returned as a storage_functions.time_base (t0, rate, n) 
+                          with exactly one time per sample. Use np.asarray(time_vector) for the array.
 
     """
     with nidaq.Task() as task:
         if type(channel)==dict: # example -> channels = {"ai0" : "omega_channel" ,  "ai3" : "mks_channel" }
             for key in channel.keys():
                 task.ai_channels.add_ai_voltage_chan(f"{device_name}/{channel[key]}",max_val=10.0,min_val=0.0)
-                task.timing.cfg_samp_clk_timing(sample_rate,sample_mode=nidaq.constants.AcquisitionType.CONTINUOUS)
-                # task.triggers.start_trigger.cfg_dig_edge_start_trig(trigger_source=f"{device_name}/{trigger_channel}",trigger_edge=nidaq.constants.Edge.RISING)
-            index = int(duration * sample_rate)
-            time_vector = np.arange(0, duration, 1/sample_rate)
-            data = task.read(number_of_samples_per_channel=index)
         else:
-            
             task.ai_channels.add_ai_voltage_chan(f"{device_name}/{channel}",max_val=10.0,min_val=0.0)
-            task.timing.cfg_samp_clk_timing(sample_rate,sample_mode=nidaq.constants.AcquisitionType.CONTINUOUS)
-            # task.triggers.start_trigger.cfg_dig_edge_start_trig(trigger_source=f"{device_name}/{trigger_channel}",trigger_edge=nidaq.constants.Edge.RISING)
-            index = int(duration * sample_rate)
-            time_vector = np.arange(0, duration, 1/sample_rate)
-            data = task.read(number_of_samples_per_channel=index)
+        task.timing.cfg_samp_clk_timing(sample_rate,sample_mode=nidaq.constants.AcquisitionType.CONTINUOUS)
+        if triggered:
+            configure_start_trigger(task, device_name, trigger_channel)
+        index = int(duration * sample_rate)
+        time_vector = time_base(0.0, sample_rate, index)
+        data = task.read(number_of_samples_per_channel=index, timeout=duration + 10 + (trigger_timeout if triggered else 0))
             
         task.stop()
         # task.clear()
@@ -157,6 +424,518 @@ def record(device_name, channel,trigger_channel, sample_rate, duration):
 
 
 
+def configure_start_trigger(task, device_name, trigger_channel="PFI0", edge="rising"):
+    """
+    Sets a task to start acquiring on a digital edge instead of when task.start() is called. 
+    With the trigger set the task can be started (armed) ahead of time and the first sample 
+    is taken on the edge, to within one sample clock period.
+    
+    The USB-6009 only accepts a start trigger on PFI0 (the port0/port1 lines are software timed), 
+    so the PLC output used for the camera/laser TTL has to be wired to PFI0.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    task : nidaqmx task (stopped)
+    device_name : DAQ name from local_sys()
+    trigger_channel : terminal of the trigger input ("PFI0" or a full terminal name like "/Dev1/PFI0")
+    edge : "rising" or "falling"
+    """
+    source = trigger_channel if trigger_channel.startswith("/") else f"/{device_name}/{trigger_channel}"
+    match edge:
+        case "rising":
+            trigger_edge = nidaq.constants.Edge.RISING
+        case "falling":
+            trigger_edge = nidaq.constants.Edge.FALLING
+        case _:
+            raise ValueError(f"Unknown trigger edge: {edge}")
+    task.triggers.start_trigger.cfg_dig_edge_start_trig(trigger_source=source, trigger_edge=trigger_edge)
+
+
+
+def channel_list(channel):
+    """
+    Returns the physical channel names as a list. Accepts either a single channel ("ai0") 
+    or the channel dictionary used by the scripts (example -> channels = {"omega_channel" : "ai0", "mks_channel" : "ai3"}).
+    """
+    if type(channel)==dict:
+        return list(channel.values())
+    return [channel]
+
+
+class daq_stream:
+    """
+    Continuous acquisition that hands blocks of samples to consumers as they arrive.
+    
+    The DAQ calls back every samples_per_block samples (register_every_n_samples_acquired_into_buffer_event) 
+    and the samples are read with a stream reader straight into one of a set of preallocated NumPy blocks.
+    A worker thread passes the filled blocks to the consumers so the processing does not hold up the DAQ.
+    This can run indefinitely without allocating lists for every read.
+    
+    Consumers are called as consumer(block, start_index) where block has the shape (channels, samples_per_block) 
+    and start_index is the index of the first sample of the block since the stream was started. 
+    The block is reused once the consumers return, so copy it if it needs to be kept.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    device_name : DAQ name from local_sys()
+    channels : channel or dictionary of channels (same as record)
+    sample_rate : sample rate per channel in Hz
+    samples_per_block : number of samples per channel in each block
+    raw : if True the unscaled ADC codes are read as int16, otherwise the voltages are read as float64
+    n_buffers : number of preallocated blocks. If the consumers fall this far behind, blocks are dropped (see dropped_blocks)
+    buffer_seconds : size of the DAQ driver buffer in seconds
+    """
+    def __init__(self, device_name, channels, sample_rate, samples_per_block, raw=False, n_buffers=8, buffer_seconds=10):
+        self.channel_names = channel_list(channels)
+        self.sample_rate = sample_rate
+        self.samples_per_block = int(samples_per_block)
+        self.raw = raw
+        self.consumers = []
+        self.samples_acquired = 0
+        self.dropped_blocks = 0
+        self.running = False
+        
+        self.task = nidaq.Task()
+        for channel in self.channel_names:
+            self.task.ai_channels.add_ai_voltage_chan(f"{device_name}/{channel}",max_val=10.0,min_val=0.0)
+        self.task.timing.cfg_samp_clk_timing(sample_rate,sample_mode=nidaq.constants.AcquisitionType.CONTINUOUS,
+                                             samps_per_chan=max(int(buffer_seconds*sample_rate), 2*self.samples_per_block))
+        
+        if raw:
+            self.reader = AnalogUnscaledReader(self.task.in_stream)
+            dtype = np.int16
+        else:
+            self.reader = AnalogMultiChannelReader(self.task.in_stream)
+            dtype = np.float64
+        
+        self.blocks = np.empty((n_buffers, len(self.channel_names), self.samples_per_block), dtype=dtype)
+        self._scratch = np.empty((len(self.channel_names), self.samples_per_block), dtype=dtype)
+        self._free = queue.Queue()
+        self._ready = queue.Queue()
+        self._worker = None
+        self._error = None
+        
+        self.task.register_every_n_samples_acquired_into_buffer_event(self.samples_per_block, self._callback)
+        
+    def add_consumer(self, consumer):
+        self.consumers.append(consumer)
+        
+    def _read(self, block):
+        if self.raw:
+            self.reader.read_int16(block, number_of_samples_per_channel=self.samples_per_block)
+        else:
+            self.reader.read_many_sample(block, number_of_samples_per_channel=self.samples_per_block)
+    
+    def _callback(self, task_handle, every_n_samples_event_type, number_of_samples, callback_data):
+        # Runs on the DAQmx thread, so only the read is done here
+        start_index = self.samples_acquired
+        self.samples_acquired += self.samples_per_block
+        try:
+            index = self._free.get_nowait()
+        except queue.Empty:
+            # consumers are behind, keep the DAQ buffer drained and drop the block
+            self._read(self._scratch)
+            self.dropped_blocks += 1
+            return 0
+        self._read(self.blocks[index])
+        self._ready.put((index, start_index))
+        return 0
+    
+    def _dispatch(self):
+        while True:
+            item = self._ready.get()
+            if item is None:
+                break
+            index, start_index = item
+            try:
+                for consumer in self.consumers:
+                    consumer(self.blocks[index], start_index)
+            except Exception as error:
+                self._error = error
+            self._free.put(index)
+        
+    def start(self):
+        if self.running:
+            return
+        for index in range(len(self.blocks)):
+            self._free.put(index)
+        self.samples_acquired = 0
+        self.dropped_blocks = 0
+        self._error = None
+        self._worker = threading.Thread(target=self._dispatch, daemon=True)
+        self._worker.start()
+        self.task.start()
+        self.running = True
+        
+    def stop(self):
+        """
+        Stops the DAQ and waits until the consumers have processed the blocks that were already read.
+        """
+        if not self.running:
+            return
+        self.task.stop()
+        self._ready.put(None)
+        self._worker.join()
+        self._free = queue.Queue()
+        self.running = False
+        if self._error is not None:
+            raise self._error
+        
+    def close(self):
+        try:
+            self.stop()
+        finally:
+            self.task.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+
+
+class daq_session:
+    """
+    Long-lived acquisition session that is reused across setpoints.
+    
+    The device lookup, task creation, channel setup and timing are done once when the session is made 
+    (pressure_read used to redo all of this, including the device search, for every measurement). 
+    The task is started and stopped for each measurement window and released with close() at the end of the run.
+    
+    For a hardware timed window call arm() before the trigger edge is sent (for example before the PLC pulses 
+    the camera/laser TTL). The task then waits for the edge and the first sample of the next read/blocks 
+    is the trigger sample. The trigger only applies to that one window, stop() disarms the session so the 
+    settle checks run untriggered.
+    
+    By default the samples are read as the unscaled int16 ADC codes (a quarter of the size of float64 volts). 
+    session.scaling holds the polynomial of each channel from codes to volts (ai_dev_scaling_coeff), 
+    see codes_to_volts and adc_lookup_table.
+    
+    The sensor on each channel is looked up in the sensor registry (session.sensors, see register_sensor), 
+    which also sets the input range of the channel. Use session.row(name) for the row of a sensor in the blocks.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    channels : channel or dictionary of channels (same as record)
+    sample_rate : sample rate per channel in Hz
+    device_name : DAQ name. If None, local_sys() is called once here.
+    buffer_seconds : size of the DAQ driver buffer in seconds
+    raw : if True (default) the samples are read as int16 ADC codes, otherwise as float64 volts
+    
+    Example
+    -------
+    session = daq_session(channels, sample_rate)
+    for p in press_set_pts:
+        ...
+        pressure_read(session.device_name, channels, trigger_channel, sample_rate, measure_duration, session=session)
+    session.close()
+    """
+    def __init__(self, channels, sample_rate, device_name=None, buffer_seconds=10, raw=True):
+        if device_name is None:
+            device_name = local_sys()
+        self.device_name = device_name
+        self.channels = channels
+        self.channel_names = channel_list(channels)
+        self.sensors = [sensor_on_channel(channel, device_name) for channel in self.channel_names]
+        self.sample_rate = sample_rate
+        self.running = False
+        self.armed = False
+        self.trigger_timeout = 0
+        
+        self.task = nidaq.Task()
+        for channel, definition in zip(self.channel_names, self.sensors):
+            self.task.ai_channels.add_ai_voltage_chan(f"{device_name}/{channel}",max_val=definition.max_val,min_val=definition.min_val)
+        self.task.timing.cfg_samp_clk_timing(sample_rate,sample_mode=nidaq.constants.AcquisitionType.CONTINUOUS,
+                                             samps_per_chan=int(buffer_seconds*sample_rate))
+        self.raw = raw
+        if raw:
+            self.reader = AnalogUnscaledReader(self.task.in_stream)
+            self.dtype = np.int16
+            self.scaling = [list(channel.ai_dev_scaling_coeff) for channel in self.task.ai_channels]
+        else:
+            self.reader = AnalogMultiChannelReader(self.task.in_stream)
+            self.dtype = np.float64
+            self.scaling = None
+        
+        # Commit the task so that starting and stopping it for every window is cheap
+        self.task.control(nidaq.constants.TaskMode.TASK_COMMIT)
+        
+    def start(self):
+        if not self.running:
+            self.task.start()
+            self.running = True
+    
+    def row(self, name):
+        """Returns the row of a sensor in the blocks read by the session."""
+        for row, definition in enumerate(self.sensors):
+            if definition.name == name:
+                return row
+        raise ValueError(f"No {name} sensor on the channels {self.channel_names}")
+    
+    def _read(self, data, n, timeout):
+        if self.raw:
+            self.reader.read_int16(data, number_of_samples_per_channel=n, timeout=timeout)
+        else:
+            self.reader.read_many_sample(data, number_of_samples_per_channel=n, timeout=timeout)
+    
+    def stop(self):
+        if self.running:
+            self.task.stop()
+            self.running = False
+        if self.armed:
+            self.task.triggers.start_trigger.disable_start_trig()
+            self.armed = False
+            self.trigger_timeout = 0
+    
+    def arm(self, trigger_channel="PFI0", edge="rising", timeout=60):
+        """
+        Sets the start trigger and starts the task so the acquisition begins on the next edge at trigger_channel.
+        The following read() or blocks() waits up to timeout seconds for the edge and its first sample is the trigger sample.
+        """
+        self.stop()
+        configure_start_trigger(self.task, self.device_name, trigger_channel, edge)
+        self.armed = True
+        self.trigger_timeout = timeout
+        self.start()
+            
+    def read(self, duration):
+        """
+        Records one measurement window of the given duration (seconds). 
+        The task is started and stopped around the read unless the session is already running.
+
+        Returns
+        -------
+        data : array with shape (channels, samples), int16 ADC codes (raw session) or volts
+        time_vector : time base (t0, rate, n) of the samples in seconds from the start of the window
+        """
+        index = int(duration * self.sample_rate)
+        time_vector = time_base(0.0, self.sample_rate, index)
+        data = np.empty((len(self.channel_names), index), dtype=self.dtype)
+        
+        was_running = self.running
+        self.start()
+        try:
+            self._read(data, index, duration + 10 + self.trigger_timeout)
+        finally:
+            if not was_running:
+                self.stop()
+        return data, time_vector
+    
+    def blocks(self, samples_per_block, max_blocks=None, total_samples=None):
+        """
+        Generator that keeps the task running and yields consecutive blocks of samples with the shape (channels, samples_per_block).
+        The same array is filled for every block, so copy it if it needs to be kept.
+        If total_samples is given the generator ends after that many samples per channel (the last block may be shorter).
+        The task is stopped when the loop over the generator ends.
+        """
+        samples_per_block = int(samples_per_block)
+        block = np.empty((len(self.channel_names), samples_per_block), dtype=self.dtype)
+        timeout = samples_per_block/self.sample_rate + 10
+        count = 0
+        remaining = total_samples
+        self.start()
+        try:
+            while (max_blocks is None or count < max_blocks) and (remaining is None or remaining > 0):
+                n = samples_per_block if remaining is None else min(samples_per_block, remaining)
+                if n < samples_per_block:
+                    # the stream readers need a contiguous array, a slice of block is not one
+                    block = np.empty((len(self.channel_names), n), dtype=self.dtype)
+                # the first block of an armed window also waits for the trigger edge
+                self._read(block, n, timeout + (self.trigger_timeout if count == 0 else 0))
+                count += 1
+                if remaining is not None:
+                    remaining -= n
+                yield block
+        finally:
+            self.stop()
+    
+    def close(self):
+        try:
+            self.stop()
+        finally:
+            self.task.close()
+            
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+
+
+class multi_daq_session:
+    """
+    Acquisition from several DAQs at once, merged into one time-aligned stream.
+    
+    Each device has its own daq_session (task) read by its own thread. The blocks of all devices are 
+    stacked into one block with the channels of every device (in the order of the devices), so 
+    pressure_read, wait_for_settle and the sinks use it the same way as a single daq_session. 
+    This spreads the sensors over devices to get past the aggregate sample rate of one USB-6009.
+    
+    Start time: without a trigger the threads wait for each other and start their tasks together, 
+    the time each task started is measured and the samples a device took before the last one started 
+    are dropped, so the devices are aligned to within the USB start latency (about a millisecond). 
+    For sample accurate alignment wire the trigger to PFI0 of every device and call arm(), 
+    all tasks then start on the same edge.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    devices : dictionary of device name -> channels, for example 
+              {local_sys(serial_number=0x01A2B3C4): {"omega_channel" : "ai0", "mks_channel" : "ai3"},
+               local_sys(serial_number=0x01A2B3C5): {"kulite_channel" : "ai0"}}
+    sample_rate : sample rate per channel in Hz (the same on every device)
+    buffer_seconds : size of the DAQ driver buffer in seconds
+    raw : if True (default) the samples are read as int16 ADC codes, otherwise as float64 volts
+    n_buffers : number of blocks each device thread can be ahead of the merge (at least 2, see blocks)
+    """
+    def __init__(self, devices, sample_rate, buffer_seconds=10, raw=True, n_buffers=8):
+        if n_buffers < 2:
+            # a thread stopped by the merge puts its last block and the end marker, both have to fit after the drain
+            raise ValueError(f"n_buffers has to be at least 2, got {n_buffers}")
+        self.sessions = []
+        try:
+            for device_name, channels in devices.items():
+                self.sessions.append(daq_session(channels, sample_rate, device_name, buffer_seconds, raw))
+        except Exception:
+            self.close()
+            raise
+        self.device_name = self.sessions[0].device_name
+        self.sample_rate = sample_rate
+        self.raw = raw
+        self.dtype = self.sessions[0].dtype
+        self.n_buffers = n_buffers
+        self.channel_names = [f"{session.device_name}/{channel}" for session in self.sessions for channel in session.channel_names]
+        self.sensors = [definition for session in self.sessions for definition in session.sensors]
+        self.scaling = [coeff for session in self.sessions for coeff in session.scaling] if raw else None
+        self.start_offsets = [0.0]*len(self.sessions)     # start time of each task after the first one, in seconds
+    
+    @property
+    def armed(self):
+        return all(session.armed for session in self.sessions)
+    
+    @property
+    def running(self):
+        return any(session.running for session in self.sessions)
+    
+    def row(self, name):
+        """Returns the row of a sensor in the merged blocks."""
+        for row, definition in enumerate(self.sensors):
+            if definition.name == name:
+                return row
+        raise ValueError(f"No {name} sensor on the channels {self.channel_names}")
+    
+    def arm(self, trigger_channel="PFI0", edge="rising", timeout=60):
+        """
+        Arms every device on its own trigger_channel, the trigger edge has to reach all of them.
+        """
+        for session in self.sessions:
+            session.arm(trigger_channel, edge, timeout)
+    
+    def stop(self):
+        for session in self.sessions:
+            session.stop()
+    
+    def _acquire(self, index, session, samples_per_block, max_blocks, total_samples, barrier, starts, output, halt):
+        # Runs in the thread of one device
+        try:
+            if not session.armed:
+                barrier.wait()
+                session.start()
+                starts[index] = time.perf_counter()
+                barrier.wait()
+                # drop the samples taken before the last device started
+                skip = int(round((max(starts) - starts[index])*session.sample_rate))
+                if skip > 0:
+                    session._read(np.empty((len(session.channel_names), skip), dtype=session.dtype), skip, skip/session.sample_rate + 10)
+            blocks = session.blocks(samples_per_block, max_blocks, total_samples)
+            try:
+                for block in blocks:
+                    if halt.is_set():
+                        break
+                    output.put(block.copy())
+            finally:
+                blocks.close()
+            output.put(None)
+        except Exception as error:
+            barrier.abort()
+            output.put(error)
+    
+    def blocks(self, samples_per_block, max_blocks=None, total_samples=None):
+        """
+        Generator of merged blocks with the shape (channels of all devices, samples_per_block), 
+        same arguments as daq_session.blocks. The tasks are stopped when the loop over the generator ends.
+        """
+        triggered = self.armed
+        barrier = threading.Barrier(len(self.sessions))
+        starts = [0.0]*len(self.sessions)
+        halt = threading.Event()
+        outputs = [queue.Queue(maxsize=self.n_buffers) for _ in self.sessions]
+        threads = [threading.Thread(target=self._acquire, daemon=True,
+                                    args=(index, session, samples_per_block, max_blocks, total_samples, barrier, starts, output, halt))
+                   for index, (session, output) in enumerate(zip(self.sessions, outputs))]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                parts = [output.get() for output in outputs]
+                for part in parts:
+                    if isinstance(part, Exception):
+                        raise part
+                if any(part is None for part in parts):
+                    break
+                if not triggered:
+                    self.start_offsets = [start - min(starts) for start in starts]
+                yield np.concatenate(parts)
+        finally:
+            halt.set()
+            for output in outputs:
+                # unblock threads waiting for room in a full queue
+                while not output.empty():
+                    output.get_nowait()
+            for thread in threads:
+                thread.join()
+            self.stop()
+    
+    def read(self, duration):
+        """
+        Records one window of the given duration (seconds) from every device.
+        
+        Returns
+        -------
+        data : array with shape (channels of all devices, samples)
+        time_vector : time base (t0, rate, n) of the samples
+        """
+        index = int(duration * self.sample_rate)
+        blocks = self.blocks(index, max_blocks=1)
+        data = next(blocks)
+        blocks.close()
+        return data, time_base(0.0, self.sample_rate, index)
+    
+    def close(self):
+        for session in self.sessions:
+            session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+
+
 def triggertest (length):
     length = 10
     x = np.linspace(1, length,num=length)
@@ -259,14 +1038,11 @@ def triggertest (length):
 def omega_read (device_name,omega_channel,trigger_channel,sample_rate,measure_duration):
     test, time_vector = record(device_name, omega_channel, trigger_channel, sample_rate,measure_duration)
     
-    #Omega Pressure setup
-    balance = 0.061                 #balenced at 0 bar
-    sensitive = 1/10.095              #V/bar
+    #Omega Pressure setup (see OMEGA_BALANCE and OMEGA_SENSITIVE)
     sens_uncert = 0.0008*101325            # From data sheet the accuracy of the sensor is +-0.08% of FS (Full Scale is 101325)
 
     # test = [np.abs(x)*10 for x in test]
-    pressure_bar = [(sensitive*x + balance) for x in test]
-    pressure_kpa = [x*1e2 -4.9 for x in pressure_bar]
+    pressure_kpa = omega_voltage_to_kpa(test)
     # pressure_bar_mean = np.mean(pressure_bar)
     pressure_kpa_mean = np.mean(pressure_kpa)
     raw_voltage = test
@@ -285,25 +1061,8 @@ def omega_read (device_name,omega_channel,trigger_channel,sample_rate,measure_du
 def mks_read(device_name, channel, trigger_channel, sample_rate, measure_duration):
     test, time_vector = record(device_name, channel, trigger_channel, sample_rate,measure_duration)
 
-    pressure_kpa = []
-    # Data from MKS MicroPirani 925 datasheet Analog output calibration Equation 13. : [Pressure (Pa), Voltage (V)]
-    # Chosen for its sensitivity from its range from 1 to 100 Torr, outside this range the sensor is not accurate
-    data_mks = np.array([
-        [1.333E2, 0.1], [6.66E2, 0.5], [1.333E3, 1.0], [6.66E3, 5.0], [1.333E4, 10]
-        ])
-
-    cal_p_mks = data_mks[:, 0]
-    cal_v_mks = data_mks[:, 1]
-
-    # Calibration interpolation function: Voltage -> Log10(Pressure)
-    interp_func = interp1d(cal_v_mks, cal_p_mks, kind='linear', fill_value="extrapolate")
-
-    def get_pressure_mks(v_input):
-        pressure = interp_func(v_input)
-        return pressure
-    
-    
-    pressure_kpa = [get_pressure_mks(x)*1e-3 for x in test]
+    # Same MKS curve as pressure_read (see mks_transfer)
+    pressure_kpa = mks_voltage_to_kpa(test)
     pressure_kpa_mean = np.mean(pressure_kpa) # pressure_kpa
     raw_voltage = test
     
@@ -364,75 +1123,688 @@ def get_weighted_avg_pressure(mks_pressure_pa,omega_pressure_pa):
 
 
 
-def pressure_read(device_name, channels, trigger_channel, sample_rate, measure_duration):
+# =====================================================
+# Vectorized conversions (whole DAQ blocks at once)
+
+# Omega factory calibration
+OMEGA_BALANCE = 0.061           # balenced at 0 bar
+OMEGA_SENSITIVE = 1/10.095      # V/bar
+
+# Data from MKS MicroPirani 925 datasheet Analog output calibration Equation 13. : [Pressure (Pa), Voltage (V)]
+# Chosen for its sensitivity from its range from 1 to 100 Torr, outside this range the sensor is not accurate
+MKS_CAL = np.array([
+    [1.333E2, 0.1], [6.66E2, 0.5], [1.333E3, 1.0], [6.66E3, 5.0], [1.333E4, 10]
+    ])
+
+# Calibration interpolation function: Voltage -> Pressure (Pa). 
+# Built once here and shared by every read path (pressure_read, mks_read and the lookup tables).
+mks_transfer = CubicSpline(MKS_CAL[:, 1], MKS_CAL[:, 0])
+
+
+def omega_voltage_to_kpa(voltage):
     """
-    Record voltages on the NI DAQ on both the omega pressure transducer and the MKS vacuum gauge. 
-    This function should replace read_omega and read_mks as it should record them in parallel.
-    Written by Ben Bemis 1/21/2026
+    Converts an array of Omega voltages to pressure in kPa using the factory calibration.
+    Gives the same result as the per sample conversion that was used in pressure_read.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
     """
-    test, time_vector = record(device_name, channels, trigger_channel, sample_rate,measure_duration)
+    voltage = np.asarray(voltage, dtype=np.float64)
+    pressure_bar = OMEGA_SENSITIVE*voltage + OMEGA_BALANCE
+    return pressure_bar*1e2 - 4.9
+
 
-    #Omega Pressure setup
-    balance = 0.061                 #balenced at 0 bar
-    sensitive = 1/10.095            #V/bar
+def mks_voltage_to_kpa(voltage):
+    """
+    Converts an array of MKS voltages to pressure in kPa using the datasheet curve.
     
-    # Data from MKS MicroPirani 925 datasheet Analog output calibration Equation 13. : [Pressure (Pa), Voltage (V)]
-    # Chosen for its sensitivity from its range from 1 to 100 Torr, outside this range the sensor is not accurate
-    data_mks = np.array([
-        [1.333E2, 0.1], [6.66E2, 0.5], [1.333E3, 1.0], [6.66E3, 5.0], [1.333E4, 10]
-        ])
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    """
+    voltage = np.asarray(voltage, dtype=np.float64)
+    return mks_transfer(voltage)*1e-3
 
-    cal_p_mks = data_mks[:, 0]
-    cal_v_mks = data_mks[:, 1]
 
-    # Calibration interpolation function: Voltage -> Pressure
-    spline = CubicSpline(cal_v_mks, cal_p_mks)
+# =====================================================
+# Sensor registry
 
-    def get_pressure_mks(v_input):
-        spline_pressure = spline(v_input)
-        return spline_pressure
+class sensor:
+    """
+    Definition of a sensor wired to the DAQ.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
     
+    Parameters
+    ----------
+    name : name of the sensor in the records (the statistics rows are <name>_voltage and <name>_<units>)
+    channel : physical analog input of the DAQ ("ai0", or "Dev2/ai0" for a channel of one device)
+    transfer : vectorized function from volts to the measured quantity (None keeps volts)
+    uncertainty : vectorized function giving the standard uncertainty of values of the measured quantity (same units), 
+                  pressure_read reports its mean over the measurement in the <name>_sigma_<units> row of the statistics
+    units : units of the measured quantity
+    min_val, max_val : input range of the channel in volts
+    """
+    def __init__(self, name, channel, transfer=None, uncertainty=None, units="V", min_val=0.0, max_val=10.0):
+        self.name = name
+        self.channel = channel
+        self.transfer = transfer
+        self.uncertainty = uncertainty
+        self.units = units
+        self.min_val = min_val
+        self.max_val = max_val
     
+    @property
+    def quantity(self):
+        """Name of the converted value in the statistics (for example omega_kpa)."""
+        return f"{self.name}_{self.units.lower()}"
     
-    # Conversion from voltage to pressure using the factory calibration for the Omega sensor
-    omega_pressure_bar = [(sensitive*x + balance) for x in test[0]]
-    omega_pressure_kpa = [x*1e2 -4.9 for x in omega_pressure_bar]
-    # pressure_bar_mean = np.mean(pressure_bar)
-    omega_pressure_kpa_mean = np.mean(omega_pressure_kpa)
-    omega_raw_voltage = test[0]
+    @property
+    def sigma_quantity(self):
+        """Name of the uncertainty of the converted value in the statistics (for example omega_sigma_kpa)."""
+        return f"{self.name}_sigma_{self.units.lower()}"
+    
+    def __repr__(self):
+        return f"sensor({self.name!r} on {self.channel!r}, {self.units})"
+
+
+# Sensors by name. The DAQ functions look up the sensor on each channel here.
+sensors = {}
+
+def register_sensor(name, channel, transfer=None, uncertainty=None, units="V", min_val=0.0, max_val=10.0):
+    """
+    Adds (or replaces) a sensor in the registry so that it is scaled with the other channels of a task.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Example
+    -------
+    # Kulite on ai1 behind an amplifier giving 0.5 V/psi
+    register_sensor("kulite", "ai1", lambda v: np.asarray(v)/0.5*6.894757, units="kPa")
+    channels = {"omega_channel" : "ai0", "kulite_channel" : "ai1", "mks_channel" : "ai3"}
+    """
+    sensors[name] = sensor(name, channel, transfer, uncertainty, units, min_val, max_val)
+    return sensors[name]
+
+def sensor_on_channel(channel, device_name=None):
+    """
+    Returns the registered sensor on a physical channel. A channel without one is read as volts.
+    With several DAQs a sensor can be registered on a channel of one device ("Dev2/ai0"), 
+    which is matched before a sensor registered on the channel alone ("ai0").
+    """
+    if device_name is not None:
+        for definition in sensors.values():
+            if definition.channel == f"{device_name}/{channel}":
+                return definition
+    for definition in sensors.values():
+        if definition.channel == channel:
+            return definition
+    return sensor(channel, channel)
+
+
+register_sensor("omega", "ai0", omega_voltage_to_kpa, 
+                lambda pressure_kpa: np.full(np.shape(pressure_kpa), 0.008*101.325), units="kPa")   # 0.8% of full scale
+register_sensor("mks", "ai3", mks_voltage_to_kpa, 
+                lambda pressure_kpa: mks_sigma_pa(np.asarray(pressure_kpa)*1e3)*1e-3, units="kPa")
+
+
+# =====================================================
+# Lookup tables indexed by the raw ADC code
+
+_lookup_tables = {}
+_stacked_tables = {}
+
+def codes_to_volts(codes, scaling_coeff):
+    """
+    Scales raw ADC codes to volts with the device scaling polynomial 
+    (channel.ai_dev_scaling_coeff in nidaqmx: volts = c0 + c1*code + c2*code**2 + ...).
+    """
+    return np.polynomial.polynomial.polyval(np.asarray(codes, dtype=np.float64), scaling_coeff)
+
+
+def adc_lookup_table(sensor, scaling_coeff):
+    """
+    Returns a table with the converted value (pressure in kPa for the Omega and MKS) for every possible int16 ADC code of a channel.
+    The table is indexed by the code viewed as uint16 (see apply_lookup_table) so converting a 
+    block is a single gather instead of evaluating the transfer function for every sample.
+    Tables are built once for each transfer function and scaling and then reused. 
+    With sensor=None the table holds the voltage of each code.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    sensor : name of a registered sensor ("omega" or "mks"), a sensor definition, or None for volts
+    scaling_coeff : scaling polynomial of the channel from codes to volts
+    """
+    if isinstance(sensor, str):
+        sensor = sensors[sensor]
+    transfer = None if sensor is None else sensor.transfer
+    key = (transfer, tuple(float(c) for c in scaling_coeff))
+    if key not in _lookup_tables:
+        codes = np.arange(2**16, dtype=np.uint16).view(np.int16)
+        table = codes_to_volts(codes, scaling_coeff)
+        if transfer is not None:
+            table = np.asarray(transfer(table), dtype=np.float64)
+        table.flags.writeable = False
+        _lookup_tables[key] = table
+    return _lookup_tables[key]
+
+
+def apply_lookup_table(table, codes):
+    """
+    Converts an int16 array of ADC codes with a table from adc_lookup_table.
+    """
+    codes = np.asarray(codes, dtype=np.int16)
+    return table[codes.view(np.uint16)]
+
+
+def scale_codes(codes, sensor_list, scaling):
+    """
+    Scales a block of int16 ADC codes with one row per channel to volts and to the units of each sensor.
+    The lookup tables of all the channels are stacked end to end, so the whole block is converted with 
+    one index computation and one gather per output instead of a pass for every channel.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    codes : int16 array with the shape (channels, samples)
+    sensor_list : sensor definition of each row (daq_session.sensors)
+    scaling : scaling polynomial of each row from codes to volts (daq_session.scaling)
+    
+    Returns
+    -------
+    voltage, value : float64 arrays with the same shape as codes
+    """
+    key = tuple((definition.transfer, tuple(float(c) for c in coeff)) for definition, coeff in zip(sensor_list, scaling))
+    if key not in _stacked_tables:
+        voltage_table = np.concatenate([adc_lookup_table(None, coeff) for coeff in scaling])
+        value_table = np.concatenate([adc_lookup_table(definition, coeff) for definition, coeff in zip(sensor_list, scaling)])
+        _stacked_tables[key] = (voltage_table, value_table)
+    voltage_table, value_table = _stacked_tables[key]
+    
+    codes = np.asarray(codes)
+    if codes.dtype != np.int16:
+        # the sums of decimate_codes are past the range of the tables
+        voltage = np.stack([codes_to_volts(row, coeff) for row, coeff in zip(codes, scaling)])
+        return scale_volts(voltage, sensor_list)
+    index = codes.view(np.uint16) + (np.arange(len(codes), dtype=np.intp)*2**16)[:, None]
+    return voltage_table[index], value_table[index]
+
+
+def scale_volts(voltage, sensor_list):
+    """
+    Converts a block of voltages with one row per channel to the units of each sensor.
+    """
+    voltage = np.asarray(voltage, dtype=np.float64)
+    value = np.empty_like(voltage)
+    for row, definition in enumerate(sensor_list):
+        value[row] = voltage[row] if definition.transfer is None else definition.transfer(voltage[row])
+    return voltage, value
+
+
+def mks_sigma_pa(mks_pressure_pa):
+    """
+    Array version of the MKS uncertainty bands used in get_weighted_avg_pressure.
+    Input and output are in Pascals.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    """
+    Torr_to_Pa = 133.322
+    mks_pressure_pa = np.asarray(mks_pressure_pa, dtype=np.float64)
+    p_torr = mks_pressure_pa/Torr_to_Pa
+    
+    # 10% of measurement, also used as the nearest error for extreme pressures (Not likely to be used)
+    sigma_mks = 0.1*mks_pressure_pa
+    
+    band = (1e-3 <= p_torr) & (p_torr < 100)
+    sigma_mks[band] = 0.05*mks_pressure_pa[band]    # 5% of the measurement
+    band = p_torr >= 100
+    sigma_mks[band] = 0.25*mks_pressure_pa[band]    # 25% of the measurement
+    
+    return sigma_mks
+
+
+def get_weighted_avg_pressure_array(mks_pressure_pa, omega_pressure_pa):
+    """
+    Array version of get_weighted_avg_pressure. Blends the two sensors with masks over the whole block 
+    instead of looping over every sample. Inputs should be in Pascals.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Returns
+    -------
+    p_combined : combined pressure in Pa for every sample
+    sigma : uncertainty of the combined pressure in Pa for every sample
+    """
+    FS = 101325 # Full scale range in Pa
+    mks_pressure_pa = np.asarray(mks_pressure_pa, dtype=np.float64)
+    omega_pressure_pa = np.asarray(omega_pressure_pa, dtype=np.float64)
+    
+    # Uncertainties
+    sigma_omega = 0.008*FS
+    sigma_mks = mks_sigma_pa(mks_pressure_pa)
+    
+    weight_omega = 1/(sigma_omega**2)
+    with np.errstate(divide='ignore'):
+        weight_mks = 1/(sigma_mks**2)
     
+    use_omega = omega_pressure_pa > 10e3     # uses the omega over 10kPa
+    use_mks = omega_pressure_pa < 3e3        # uses the mks under 3kPa
+    blend = ~(use_omega | use_mks)           # uses a weighted combination in between 3 and 10 kPa
     
-    # Conversion from voltage to presssure for the MKS
-    mks_pressure_kpa = [get_pressure_mks(x)*1e-3 for x in test[1]]
-    mks_pressure_kpa_mean = np.mean(mks_pressure_kpa) # pressure_kpa
-    mks_raw_voltage = test[1]
+    p_combined = np.empty_like(omega_pressure_pa)
+    sigma = np.empty_like(omega_pressure_pa)
     
+    p_combined[use_omega] = omega_pressure_pa[use_omega]
+    sigma[use_omega] = np.sqrt(1/(weight_omega))
     
-    # Combination of the two pressure transducers
-    combined_pressure = []
-    sigma = []
-    for pt in range(len(test[0])):
-        combined_pressure_new, sigma_new = get_weighted_avg_pressure(mks_pressure_kpa[pt]*1e3, omega_pressure_kpa[pt]*1e3)
-        combined_pressure = np.append(combined_pressure, combined_pressure_new)
-        sigma = np.append(sigma, sigma_new)
+    p_combined[use_mks] = mks_pressure_pa[use_mks]
+    sigma[use_mks] = np.sqrt(1/(weight_mks[use_mks]))
+    
+    w_mks = weight_mks[blend]
+    p_combined[blend] = (weight_omega *omega_pressure_pa[blend] + w_mks*mks_pressure_pa[blend]) / (w_mks+weight_omega)
+    sigma[blend] = np.sqrt(1/(weight_omega+w_mks))
+    
+    return p_combined, sigma
+
+
+def convert_block(omega_voltage, mks_voltage):
+    """
+    Converts a block of Omega and MKS voltages into pressures and the combined pressure.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Returns
+    -------
+    omega_pressure_kpa, mks_pressure_kpa, combined_pressure_pa, sigma_pa
+    """
+    omega_pressure_kpa = omega_voltage_to_kpa(omega_voltage)
+    mks_pressure_kpa = mks_voltage_to_kpa(mks_voltage)
+    combined_pressure, sigma = get_weighted_avg_pressure_array(mks_pressure_kpa*1e3, omega_pressure_kpa*1e3)
+    return omega_pressure_kpa, mks_pressure_kpa, combined_pressure, sigma
+
+
+def convert_code_block(codes, scaling):
+    """
+    Converts a block of int16 ADC codes (Omega in row 0, MKS in row 1) with the lookup tables.
+    Gives the same values as scaling the codes to volts and calling convert_block.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    codes : int16 array with the shape (2, samples)
+    scaling : scaling polynomials from codes to volts of the two channels (daq_session.scaling)
+    
+    Returns
+    -------
+    omega_voltage, mks_voltage, omega_pressure_kpa, mks_pressure_kpa, combined_pressure_pa, sigma_pa
+    """
+    voltage, pressure_kpa = scale_codes(codes[:2], [sensors["omega"], sensors["mks"]], scaling[:2])
+    omega_voltage, mks_voltage = voltage
+    omega_pressure_kpa, mks_pressure_kpa = pressure_kpa
+    combined_pressure, sigma = get_weighted_avg_pressure_array(mks_pressure_kpa*1e3, omega_pressure_kpa*1e3)
+    return omega_voltage, mks_voltage, omega_pressure_kpa, mks_pressure_kpa, combined_pressure, sigma
+
+
+def _scale_session_block(session, block):
+    # Blocks from a raw session are ADC codes, otherwise volts
+    if session.raw:
+        return scale_codes(block, session.sensors, session.scaling)
+    return scale_volts(block, session.sensors)
+
+
+def whole_cycle_samples(sample_rate, line_frequency, max_cycles=60):
+    """
+    Returns the smallest number of samples that covers a whole number of mains cycles, and that number of cycles.
+    
+    Mains pickup averages out of a mean taken over whole cycles, over any other window it adds a bias of up to 
+    the pickup amplitude divided by the number of cycles. At 1 kHz and 60 Hz this is 50 samples (3 cycles). 
+    If no group of up to max_cycles cycles is a whole number of samples, the closest one is used.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    """
+    samples_per_cycle = Fraction(sample_rate/line_frequency).limit_denominator(max_cycles)
+    return samples_per_cycle.numerator, samples_per_cycle.denominator
+
+
+# Highest aggregate sample rate (all channels together) of the DAQs, in samples per second
+MAX_AGGREGATE_RATE = {"USB-6009": 48000, "USB-6008": 10000}
+
+def plan_sampling(n_channels, time_budget, target_sem_kpa=None, noise_kpa=None, output_rate=1000, product_type="USB-6009"):
+    """
+    Picks the sample rate, the on the fly averaging and the measurement duration of a setpoint.
+    
+    The channels are sampled at the highest rate the DAQ allows and pressure_read(output_rate=...) averages 
+    every decimation samples into one kept sample. The setpoint statistics use every sample, so the standard 
+    error of the mean for white noise drops with the square root of the sample rate for the same chamber time, 
+    while the kept stream has the same size as sampling at output_rate.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    n_channels : number of analog inputs on the task
+    time_budget : longest measurement of a setpoint in seconds
+    target_sem_kpa : standard error of the combined pressure to reach (kPa), None uses the whole time budget
+    noise_kpa : standard deviation of single samples of the combined pressure (kPa). 
+                None takes it from the last measurement (ni_vars.stats) if there is one.
+    output_rate : rate of the kept samples in Hz
+    product_type : DAQ model, sets the highest aggregate rate (MAX_AGGREGATE_RATE)
+    
+    Returns
+    -------
+    plan : dictionary with "sample_rate" (per channel, for daq_session), "decimation" (samples averaged per kept sample), 
+           "output_rate" (for pressure_read), "measure_duration" (s) and "expected_sem_kpa" (None if the noise is unknown)
+    """
+    max_rate = MAX_AGGREGATE_RATE[product_type]//n_channels
+    decimation = max(int(max_rate//output_rate), 1)
+    sample_rate = decimation*output_rate
+    if sample_rate > max_rate:
+        raise ValueError(f"output_rate {output_rate} Hz is above the {max_rate} Hz per channel of the {product_type} with {n_channels} channels")
+    
+    last = getattr(ni_vars, "stats", None)
+    if noise_kpa is None and last is not None and last.count > 1:
+        noise_kpa = float(last.std[ni_vars.summary_channels.index("combined_kpa")])
+    measure_duration = time_budget
+    if target_sem_kpa is not None and noise_kpa is not None:
+        # samples needed for the target standard error, assuming independent samples
+        measure_duration = min(time_budget, (noise_kpa/target_sem_kpa)**2/sample_rate)
+        measure_duration = max(measure_duration, 1/output_rate)
+    expected_sem_kpa = None if noise_kpa is None else float(noise_kpa/np.sqrt(measure_duration*sample_rate))
+    
+    return {"sample_rate": sample_rate, "decimation": decimation, "output_rate": output_rate, 
+            "measure_duration": measure_duration, "expected_sem_kpa": expected_sem_kpa}
+
 
+def acquisition_rate(n_channels, sample_rate, measure_duration):
+    """
+    Rate to open the daq_session at for sample_rate kept samples per second: sample_rate itself, 
+    or with initialize(oversample=True) the highest rate of the DAQ that is a whole multiple of it (see plan_sampling).
+    """
+    if ni_vars.options["oversample"]:
+        return plan_sampling(n_channels, measure_duration, output_rate=sample_rate)["sample_rate"]
+    return sample_rate
+
+
+def decimate_codes(codes, decimation):
+    """
+    Sums every decimation samples of a block of ADC codes with the shape (channels, samples) into one. 
+    The int32 sums are the mean codes scaled by decimation, so the kept samples keep the resolution below 
+    one code that the averaging gains. Scale them with decimated_scaling(). 
+    The number of samples has to be a multiple of decimation.
+    """
+    if decimation == 1:
+        return codes
+    return codes.reshape(codes.shape[0], -1, decimation).sum(axis=2, dtype=np.int32)
+
+
+def decimated_scaling(scaling, decimation):
+    """
+    Scaling polynomials from the sums of decimate_codes to volts (the volts of the mean code of each sum).
+    """
+    return [[float(c)/decimation**power for power, c in enumerate(coeff)] for coeff in scaling]
+
+
+def wait_for_settle(session, tolerance_kpa=0.05, rel_tolerance=2e-3, window=5.0, block_duration=0.25, timeout=120, min_wait=0.0):
+    """
+    Waits for the chamber pressure to settle after a pressure change instead of sleeping for a fixed time.
+    
+    The combined pressure is streamed from the DAQ in short blocks. Over the last window seconds of block 
+    means a straight line is fitted and the chamber is declared steady once both the drift of the line over 
+    the window and the scatter about the line are within the tolerance. 
+    The tolerance is the larger of tolerance_kpa and rel_tolerance times the pressure, 
+    so the test is not too strict near atmosphere or too loose at low pressure.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    session : daq_session with the Omega and MKS channels
+    tolerance_kpa : absolute tolerance in kPa
+    rel_tolerance : tolerance as a fraction of the pressure
+    window : length of the rolling window in seconds
+    block_duration : length of each block in seconds
+    timeout : maximum wait in seconds
+    min_wait : minimum wait in seconds
+
+    Returns
+    -------
+    settle_time : time waited in seconds (from the DAQ sample clock). ni_vars.settled is False if the timeout was reached first.
+    """
+    samples_per_block = max(int(block_duration*session.sample_rate), 1)
+    block_duration = samples_per_block/session.sample_rate
+    omega_row, mks_row = session.row("omega"), session.row("mks")
+    n_window = max(int(round(window/block_duration)), 3)
+    times = []
+    means = []
+    settled = False
+    elapsed = 0.0
+    
+    blocks = session.blocks(samples_per_block)
+    for count, block in enumerate(blocks):
+        _, values = _scale_session_block(session, block)
+        combined_pressure, _ = get_weighted_avg_pressure_array(values[mks_row]*1e3, values[omega_row]*1e3)
+        times.append((count + 0.5)*block_duration)
+        means.append(np.mean(combined_pressure)*1e-3)
+        times = times[-n_window:]
+        means = means[-n_window:]
+        elapsed = (count + 1)*block_duration
         
+        if len(means) == n_window and elapsed >= min_wait:
+            t = np.asarray(times) - np.mean(times)
+            p = np.asarray(means)
+            slope = np.sum(t*(p - np.mean(p)))/np.sum(t**2)
+            residual = p - np.mean(p) - slope*t
+            tolerance = max(tolerance_kpa, rel_tolerance*abs(np.mean(p)))
+            if abs(slope)*window <= tolerance and np.std(residual) <= tolerance:
+                settled = True
+                break
+        if elapsed >= timeout:
+            break
+    blocks.close()
     
+    settle_time = elapsed
+    ni_vars.settle_time = settle_time
+    ni_vars.settled = settled
+    if settled:
+        print(f"Pressure settled at {means[-1]:.3f} kPa after {settle_time:.1f} s")
+    else:
+        print(f"Pressure did not settle within {timeout} s (last reading {means[-1]:.3f} kPa)")
+    print("="*50)
+    return settle_time
+
+
+def settle(session, wait):
+    """
+    Waits for the pressure after a change of the regulator. With initialize(settle_mode="fixed") this sleeps 
+    for wait seconds, with "adaptive" it returns once the pressure is steady (wait_for_settle, at most wait seconds).
+    """
+    if ni_vars.options["settle_mode"] == "adaptive":
+        wait_for_settle(session, timeout=wait)
+    else:
+        time.sleep(wait)
+
+
+def arm_trigger(session):
+    """
+    Arms the session on the start trigger of initialize(start_trigger=...), so the next measurement 
+    starts on its edge. Does nothing without a start trigger.
+    """
+    if ni_vars.options["start_trigger"] is not None and not session.armed:
+        session.arm(ni_vars.options["start_trigger"])
+
+
+def pressure_read(device_name, channels, trigger_channel, sample_rate, measure_duration, session=None,
+                  target_sem_kpa=None, min_duration=0.5, max_duration=None, block_duration=0.1, triggered=False,
+                  line_frequency=None, output_rate=None):
+    """
+    Record voltages on the NI DAQ on both the omega pressure transducer and the MKS vacuum gauge. 
+    This function should replace read_omega and read_mks as it should record them in parallel.
+    Every sensor on the task is read as int16 ADC codes in blocks, scaled together and accumulated in 
+    ni_vars.stats (rows named in ni_vars.summary_channels), and every block is passed to the sinks (add_sink). 
+    The results are written to ni_vars, call update() to add them to the run records.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    device_name : DAQ used for a temporary session (when session is None)
+    channels : dictionary of the channels, for a temporary session
+    trigger_channel : input of the start trigger (PFI0 on the USB-6009)
+    sample_rate : sample rate of a temporary session in Hz (a given session uses its own), 
+                  with initialize(oversample=True) the rate of the kept samples
+    measure_duration : measurement duration in seconds
+    session : daq_session (or multi_daq_session) reused for the measurement, None opens a temporary one
+    target_sem_kpa : stop as soon as the standard error of the combined pressure (from the block means) is below this, 
+                     None uses the one given to initialize
+    min_duration, max_duration : shortest and longest measurement with target_sem_kpa (max_duration defaults to measure_duration)
+    block_duration : seconds of samples processed at a time
+    triggered : arm the DAQ on trigger_channel so the measurement starts on the edge (ni_vars.trigger_index is then 0)
+    line_frequency : mains frequency in Hz, rounds the blocks and the measurement to whole mains cycles (see whole_cycle_samples), 
+                     None rounds them only with initialize(cycle_average=True)
+    output_rate : rate of the kept samples, a whole fraction of the sample rate (see plan_sampling), 
+                  None keeps every sample (or sample_rate samples per second with initialize(oversample=True)). 
+                  The statistics use every sample, the raw records and sinks get the sums of each group of 
+                  samples (decimate_codes) with the scaling of their mean.
+    """
+    if session is None:
+        with daq_session(channels, acquisition_rate(len(channels), sample_rate, measure_duration), device_name) as temporary_session:
+            return pressure_read(device_name, channels, trigger_channel, sample_rate, measure_duration, temporary_session,
+                                 target_sem_kpa, min_duration, max_duration, block_duration, triggered, line_frequency, output_rate)
+    
+    keep_raw = ni_vars.record_mode == "raw"
+    if not session.raw:
+        raise ValueError("pressure_read needs a session that reads ADC codes (daq_session(..., raw=True))")
+    if triggered and not session.armed:
+        session.arm(trigger_channel)
+    triggered = session.armed
+    options = ni_vars.options
+    if target_sem_kpa is None:
+        target_sem_kpa = options["target_sem_kpa"]
+    if line_frequency is None:
+        line_frequency = options["line_frequency"]
+    if output_rate is None:
+        output_rate = sample_rate if options["oversample"] else session.sample_rate
+    sample_rate = session.sample_rate
+    if target_sem_kpa is not None and max_duration is not None:
+        measure_duration = max_duration
+    decimation = int(round(sample_rate/output_rate))
+    if decimation < 1 or decimation*output_rate != sample_rate:
+        raise ValueError(f"output_rate {output_rate} Hz has to be the sample rate ({sample_rate} Hz) divided by a whole number")
+    samples_per_block = max(int(block_duration*sample_rate), 1)
+    total_samples = int(measure_duration*sample_rate)
+    min_samples = int(min_duration*sample_rate)
+    # every block (and so any measurement made of whole blocks) is a whole number of kept samples 
+    # and of mains cycles if line_frequency is given
+    group = decimation
+    if line_frequency is not None:
+        group = np.lcm(group, whole_cycle_samples(sample_rate, line_frequency)[0])
+    samples_per_block = max(round(samples_per_block/group), 1)*group
+    total_samples = max(round(total_samples/group), 1)*group
+    min_samples = round(min_samples/group)*group
+    sensor_list = session.sensors
+    names = [definition.name for definition in sensor_list]
+    scaling = session.scaling
+    kept_scaling = decimated_scaling(scaling, decimation)     # of the kept samples (sums of decimation codes)
+    omega_row, mks_row = session.row("omega"), session.row("mks")
+    uncertain_rows = [row for row, definition in enumerate(sensor_list) if definition.uncertainty is not None]
+    summary_channels = ([f"{name}_voltage" for name in names] + [definition.quantity for definition in sensor_list] 
+                        + [sensor_list[row].sigma_quantity for row in uncertain_rows] + ["combined_kpa", "combined_sigma_kpa"])
     
+    if ni_vars.spool is None and ni_vars.spool_settings is not None:
+        settings = ni_vars.spool_settings
+        spool_dtype = np.dtype(settings["dtype"])
+        if decimation > 1 and np.issubdtype(spool_dtype, np.integer):
+            spool_dtype = np.promote_types(spool_dtype, np.int32)     # room for the sums of decimate_codes
+        ni_vars.spool = raw_spool(settings["path"], names, output_rate, dtype=spool_dtype, capacity=settings["capacity"])
+        add_sink(ni_vars.spool)
+    
+    stats = online_stats(len(summary_channels))
+    block_means = online_stats(1)       # means of the blocks of combined pressure, for the standard error
+    psd = None
+    if ni_vars.psd_settings is not None:
+        psd = welch_psd(len(names), sample_rate, ni_vars.psd_settings["segment_length"])
+    sinks = ni_vars.sinks
+    sink_starts = []
+    for sink in sinks:
+        sink.sample_rate = output_rate
+        sink.channel_names = names
+        sink.scaling = kept_scaling
+        sink_starts.append(sink.size)
+    recorded = []
+    
+    blocks = session.blocks(samples_per_block, total_samples=total_samples)
+    for block in blocks:
+        # Conversion of every channel from ADC codes to voltage and to its units in one pass, 
+        # then the combination of the two pressure transducers
+        voltage, value = scale_codes(block, sensor_list, scaling)
+        combined_pressure, sigma = get_weighted_avg_pressure_array(value[mks_row]*1e3, value[omega_row]*1e3)
+        combined_pressure_kpa = combined_pressure*1e-3
+        sigma_kpa = sigma*1e-3
+        # uncertainty of each sensor that has one (from the registry)
+        sensor_sigma = np.empty((len(uncertain_rows), value.shape[1]))
+        for index, row in enumerate(uncertain_rows):
+            sensor_sigma[index] = sensor_list[row].uncertainty(value[row])
+        stats.update(np.concatenate([voltage, value, sensor_sigma, combined_pressure_kpa[None], sigma_kpa[None]]))
+        block_means.update(np.mean(combined_pressure_kpa))
+        if psd is not None:
+            psd.update(voltage)
+        kept = decimate_codes(block, decimation)
+        if keep_raw:
+            recorded.append(kept.copy())
+        for sink in sinks:
+            sink.append(kept)
+        
+        if target_sem_kpa is not None and stats.count >= min_samples and block_means.count >= 2 and block_means.sem[0] <= target_sem_kpa:
+            break
+    blocks.close()
+    
+    ni_vars.sensors = sensor_list
+    ni_vars.scaling = dict(zip(names, kept_scaling))
+    ni_vars.summary_channels = summary_channels
+    if keep_raw:
+        codes = np.concatenate(recorded, axis=1)
+        voltage, value = scale_codes(codes, sensor_list, kept_scaling)
+        omega_raw_voltage, mks_raw_voltage = voltage[omega_row], voltage[mks_row]
+        omega_pressure_kpa, mks_pressure_kpa = value[omega_row], value[mks_row]
+        ni_vars.codes = dict(zip(names, codes))
+    else:
+        omega_raw_voltage = mks_raw_voltage = omega_pressure_kpa = mks_pressure_kpa = ni_vars.codes = None
+    # Both sensors are sampled on the same clock so they share one time base
+    time_vector = time_base((decimation - 1)/(2*sample_rate), output_rate, stats.count//decimation)
     
     # Writing Omega sensor to class
     ni_vars.time_vector = time_vector
     ni_vars.pressure_kpa = omega_pressure_kpa
-    ni_vars.pressure_kpa_mean = omega_pressure_kpa_mean
+    ni_vars.pressure_kpa_mean = stats.mean[summary_channels.index("omega_kpa")]
     ni_vars.raw_voltage = omega_raw_voltage
 
     # Writing MKS to class
     ni_vars.mks_time_vector = time_vector
     ni_vars.mks_pressure_kpa = mks_pressure_kpa
-    ni_vars.mks_pressure_kpa_mean = mks_pressure_kpa_mean
+    ni_vars.mks_pressure_kpa_mean = stats.mean[summary_channels.index("mks_kpa")]
     ni_vars.mks_raw_voltage = mks_raw_voltage
     
     # Writing Combined weighted average to class
-    ni_vars.pressure_combined_kpa = float(np.mean(combined_pressure*1e-3))
-    ni_vars.pressure_combined_sigma_kpa = float(np.mean(sigma*1e-3))
-
+    ni_vars.pressure_combined_kpa = float(stats.mean[-2])
+    ni_vars.pressure_combined_sigma_kpa = float(stats.mean[-1])
+    ni_vars.pressure_combined_sem_kpa = float(block_means.sem[0]) if block_means.count >= 2 else None
+    ni_vars.measure_duration = stats.count/sample_rate
+    ni_vars.trigger_index = 0 if triggered else None     # the start trigger is the first sample of the window
+    ni_vars.stats = stats
+    ni_vars.psd = psd
+    ni_vars.sink_ranges = [(sink, start, sink.size) for sink, start in zip(sinks, sink_starts)]
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+@author: Benjamin Bemis Ph.D Student
+
+Simulated NI-DAQ backend. This mimics the part of nidaqmx that ni_functions uses
+(System.local().devices, Task, ai_channels.add_ai_voltage_chan, timing, triggers, read and the stream readers)
+so the acquisition pipeline can be run, profiled and regression tested without the USB-6009.
+
+The Omega and MKS voltages are generated from a pressure trajectory by inverting the calibrations in ni_functions.
+The output is deterministic for a given seed.
+
+Usage:
+    import ni_functions as ni
+    import ni_simulator as sim
+
+    ni.use_backend("simulated")
+    sim.configure(pressure_source=sim.pressure_trajectory([0, 60], [100, 1]), time_scale=0)
+    ni.pressure_read(ni.local_sys(), channels, trigger_channel, sample_rate, measure_duration)
+"""
+import threading
+import time
+from enum import Enum
+from types import SimpleNamespace
+import numpy as np
+import ni_functions as ni
+
+
+class sim_config:
+    """
+    Settings of the simulated DAQ. Change these with configure().
+
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+
+    pressure_source : function of the simulator time in seconds that returns the chamber pressure in kPa
+    sensors : which sensor is wired to each analog input (same wiring as the chamber: Omega on ai0 and MKS on ai3). 
+              An input of one device can be given as "Dev2/ai0".
+    noise_v : standard deviation of the voltage noise on each analog input
+    line_pickup_v : amplitude of the mains pickup added to every analog input
+    line_frequency : mains frequency in Hz
+    time_scale : 1 runs in real time, 10 runs ten times faster and 0 runs as fast as possible
+    trigger_delay : simulator time in seconds from starting a task with a start trigger until the trigger edge arrives
+    seed : seed for the noise, the same seed gives the same samples
+    devices : the devices returned by System.local()
+    """
+    pressure_source = staticmethod(lambda t: 95.0)   # inside the Omega range (10 V is about 100 kPa)
+    sensors = {"ai0": "omega", "ai3": "mks"}
+    noise_v = {"ai0": 1e-3, "ai3": 1e-3}
+    line_pickup_v = 0.0
+    line_frequency = 60
+    time_scale = 1.0
+    trigger_delay = 0.0
+    seed = 0
+    devices = [{"name": "Dev1", "product_type": "USB-6009", "serial_num": 0x01A2B3C4}]
+
+    # USB-6009 single ended inputs: +-10 V over 13 bit codes (14 bit is only in differential mode)
+    code_gain = 20/2**13
+    code_min = -2**12
+    code_max = 2**12 - 1
+
+    epoch = time.monotonic()    # simulator time zero (real time mode)
+    virtual_time = 0.0          # simulator time when running as fast as possible
+    task_count = 0
+
+
+def configure(**settings):
+    """
+    Changes the simulator settings (see sim_config) and restarts the simulator clock.
+    """
+    for key, value in settings.items():
+        if not hasattr(sim_config, key):
+            raise AttributeError(f"Unknown simulator setting: {key}")
+        if key == "pressure_source":
+            value = staticmethod(value)
+        setattr(sim_config, key, value)
+    reset()
+
+
+def reset():
+    """
+    Restarts the simulator clock and the noise so the next run gives the same samples.
+    """
+    sim_config.epoch = time.monotonic()
+    sim_config.virtual_time = 0.0
+    sim_config.task_count = 0
+
+
+def now():
+    """
+    Simulator time in seconds.
+    """
+    if sim_config.time_scale > 0:
+        return (time.monotonic() - sim_config.epoch)*sim_config.time_scale
+    return sim_config.virtual_time
+
+
+def sleep(seconds):
+    """
+    Waits for the given simulator time. Useful in place of time.sleep when the simulator runs faster than real time.
+    """
+    if sim_config.time_scale > 0:
+        time.sleep(seconds/sim_config.time_scale)
+    else:
+        sim_config.virtual_time += seconds
+
+
+def pressure_trajectory(times_s, pressures_kpa):
+    """
+    Returns a pressure source that interpolates linearly between the given points (constant outside of them).
+    """
+    times_s = np.asarray(times_s, dtype=np.float64)
+    pressures_kpa = np.asarray(pressures_kpa, dtype=np.float64)
+    return lambda t: np.interp(t, times_s, pressures_kpa)
+
+
+# =====================================================
+# Sensor models (inverse of the calibrations in ni_functions)
+
+def omega_kpa_to_voltage(pressure_kpa):
+    pressure_bar = (np.asarray(pressure_kpa, dtype=np.float64) + 4.9)*1e-2
+    return (pressure_bar - ni.OMEGA_BALANCE)/ni.OMEGA_SENSITIVE
+
+
+_mks_v_grid = np.linspace(0, 10, 4001)
+_mks_kpa_grid = ni.mks_voltage_to_kpa(_mks_v_grid)
+
+def mks_kpa_to_voltage(pressure_kpa):
+    # the MKS output is limited to 0-10 V
+    return np.interp(pressure_kpa, _mks_kpa_grid, _mks_v_grid)
+
+
+sensor_voltage = {"omega": omega_kpa_to_voltage,
+                  "mks": mks_kpa_to_voltage}
+
+
+# =====================================================
+# nidaqmx look-alike
+
+constants = SimpleNamespace(
+    AcquisitionType=Enum("AcquisitionType", ["FINITE", "CONTINUOUS"]),
+    Edge=Enum("Edge", ["RISING", "FALLING"]),
+    TaskMode=Enum("TaskMode", ["TASK_START", "TASK_STOP", "TASK_VERIFY", "TASK_COMMIT", "TASK_RESERVE", "TASK_UNRESERVE", "TASK_ABORT"]),
+    EveryNSamplesEventType=Enum("EveryNSamplesEventType", ["ACQUIRED_INTO_BUFFER"]),
+    )
+
+
+class _device:
+    def __init__(self, settings):
+        self.name = settings["name"]
+        self.product_type = settings.get("product_type", "USB-6009")
+        self.serial_num = settings.get("serial_num", 0)
+        self.bus_type = "USB"
+        self.ai_physical_chans = [f"{self.name}/ai{i}" for i in range(8)]
+        self.ao_physical_chans = [f"{self.name}/ao{i}" for i in range(2)]
+        self.di_ports = [f"{self.name}/port0", f"{self.name}/port1"]
+        self.do_ports = [f"{self.name}/port0", f"{self.name}/port1"]
+
+
+class _system:
+    @staticmethod
+    def local():
+        return SimpleNamespace(devices=[_device(settings) for settings in sim_config.devices])
+
+
+system = SimpleNamespace(System=_system)
+
+
+class _channel:
+    def __init__(self, physical_channel, min_val, max_val):
+        self.name = physical_channel
+        self.physical_channel = physical_channel
+        self.device_name, self.channel = physical_channel.split("/")[-2:]
+        self.ai_min = min_val
+        self.ai_max = max_val
+        # volts = c0 + c1*code
+        self.ai_dev_scaling_coeff = [0.0, sim_config.code_gain]
+
+
+class _ai_channels(list):
+    def add_ai_voltage_chan(self, physical_channel, name_to_assign_to_channel="", terminal_config=None, min_val=-5.0, max_val=5.0, **kwargs):
+        channel = _channel(physical_channel, min_val, max_val)
+        self.append(channel)
+        return channel
+
+    @property
+    def channel_names(self):
+        return [channel.name for channel in self]
+
+
+class _timing:
+    def __init__(self):
+        self.samp_clk_rate = 1000.0
+        self.samp_quant_samp_mode = constants.AcquisitionType.FINITE
+        self.samp_quant_samp_per_chan = 1000
+
+    def cfg_samp_clk_timing(self, rate, source="", active_edge=None, sample_mode=None, samps_per_chan=1000):
+        self.samp_clk_rate = float(rate)
+        if sample_mode is not None:
+            self.samp_quant_samp_mode = sample_mode
+        self.samp_quant_samp_per_chan = samps_per_chan
+
+
+class _start_trigger:
+    def __init__(self):
+        self.source = None
+        self.edge = None
+
+    def cfg_dig_edge_start_trig(self, trigger_source, trigger_edge=None):
+        self.source = trigger_source
+        self.edge = trigger_edge
+
+    def disable_start_trig(self):
+        self.source = None
+        self.edge = None
+
+
+class Task:
+    """
+    Simulated nidaqmx.Task. Samples are produced at the configured rate from the time the task is started
+    (or from the start trigger) and read() waits until the requested samples would have been acquired.
+    """
+    def __init__(self, new_task_name=""):
+        self.name = new_task_name
+        self.ai_channels = _ai_channels()
+        self.timing = _timing()
+        self.triggers = SimpleNamespace(start_trigger=_start_trigger())
+        self.in_stream = SimpleNamespace(task=self, total_samp_per_chan_acquired=0)
+        self.running = False
+        self._t0 = 0.0
+        self._position = 0
+        self._rng = None
+        self._event = None
+        self._event_thread = None
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------
+    def control(self, action):
+        pass
+
+    def start(self):
+        if self.running:
+            return
+        self._rng = np.random.default_rng([sim_config.seed, sim_config.task_count])
+        sim_config.task_count += 1
+        # an armed task takes its first sample when the trigger edge arrives
+        self._t0 = now() + (sim_config.trigger_delay if self.triggers.start_trigger.source is not None else 0.0)
+        self._position = 0
+        self.in_stream.total_samp_per_chan_acquired = 0
+        self.running = True
+        if self._event is not None:
+            self._event_thread = threading.Thread(target=self._run_event, daemon=True)
+            self._event_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self._event_thread is not None and self._event_thread is not threading.current_thread():
+            self._event_thread.join()
+        self._event_thread = None
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # ---------------------------------------------
+    def register_every_n_samples_acquired_into_buffer_event(self, sample_interval, callback_method):
+        self._event = (int(sample_interval), callback_method)
+
+    def _run_event(self):
+        n, callback = self._event
+        delivered = 0
+        while self.running:
+            self._wait_for(delivered + n)
+            if not self.running:
+                break
+            callback(id(self), constants.EveryNSamplesEventType.ACQUIRED_INTO_BUFFER, n, None)
+            delivered += n
+
+    def _wait_for(self, count):
+        # Wait until count samples per channel have been acquired since the start
+        if sim_config.time_scale > 0:
+            remaining = self._t0 + count/self.timing.samp_clk_rate - now()
+            if remaining > 0:
+                time.sleep(remaining/sim_config.time_scale)
+        else:
+            sim_config.virtual_time = max(sim_config.virtual_time, self._t0 + count/self.timing.samp_clk_rate)
+
+    # ---------------------------------------------
+    def _generate_codes(self, n):
+        with self._lock:
+            if not self.running and self._event is None:
+                # like nidaqmx, reading a task that was not started starts it
+                self.start()
+            self._wait_for(self._position + n)
+            rate = self.timing.samp_clk_rate
+            t = self._t0 + (self._position + np.arange(n))/rate
+            pressure = np.asarray(sim_config.pressure_source(t), dtype=np.float64)*np.ones(n)
+
+            codes = np.empty((len(self.ai_channels), n), dtype=np.int16)
+            for row, channel in enumerate(self.ai_channels):
+                sensor = sim_config.sensors.get(f"{channel.device_name}/{channel.channel}", sim_config.sensors.get(channel.channel))
+                if sensor in sensor_voltage:
+                    voltage = sensor_voltage[sensor](pressure)
+                else:
+                    voltage = np.zeros(n)
+                voltage = voltage + sim_config.noise_v.get(f"{channel.device_name}/{channel.channel}", sim_config.noise_v.get(channel.channel, 0.0))*self._rng.standard_normal(n)
+                if sim_config.line_pickup_v:
+                    voltage = voltage + sim_config.line_pickup_v*np.sin(2*np.pi*sim_config.line_frequency*t)
+                code = np.round((voltage - channel.ai_dev_scaling_coeff[0])/channel.ai_dev_scaling_coeff[1])
+                codes[row] = np.clip(code, sim_config.code_min, sim_config.code_max)
+
+            self._position += n
+            self.in_stream.total_samp_per_chan_acquired = self._position
+            return codes
+
+    def _generate(self, n):
+        codes = self._generate_codes(n)
+        voltage = np.empty(codes.shape)
+        for row, channel in enumerate(self.ai_channels):
+            c0, c1 = channel.ai_dev_scaling_coeff
+            voltage[row] = c0 + c1*codes[row]
+        return voltage
+
+    def read(self, number_of_samples_per_channel=None, timeout=10.0):
+        """
+        Same return types as nidaqmx: a float for one sample on one channel, a list for one channel and a list of lists for several channels.
+        """
+        n = 1 if number_of_samples_per_channel is None else int(number_of_samples_per_channel)
+        data = self._generate(n)
+        if len(self.ai_channels) == 1:
+            if number_of_samples_per_channel is None:
+                return float(data[0, 0])
+            return data[0].tolist()
+        if number_of_samples_per_channel is None:
+            return data[:, 0].tolist()
+        return data.tolist()
+
+
+def _check_buffer(data, dtype):
+    # nidaqmx reads straight into the memory of the array, so it has to be C-contiguous, writeable and of the right type
+    if not isinstance(data, np.ndarray) or data.dtype != dtype:
+        raise TypeError(f"The read buffer has to be a numpy array of {np.dtype(dtype)}")
+    if not data.flags.c_contiguous or not data.flags.writeable:
+        raise ValueError("The read buffer has to be a C-contiguous, writeable array")
+
+
+class _analog_multi_channel_reader:
+    def __init__(self, task_in_stream):
+        self._task = task_in_stream.task
+
+    def read_many_sample(self, data, number_of_samples_per_channel=-1, timeout=10.0):
+        _check_buffer(data, np.float64)
+        data[:, :number_of_samples_per_channel] = self._task._generate(number_of_samples_per_channel)
+        return number_of_samples_per_channel
+
+
+class _analog_unscaled_reader:
+    def __init__(self, task_in_stream):
+        self._task = task_in_stream.task
+
+    def read_int16(self, data, number_of_samples_per_channel=-1, timeout=10.0):
+        _check_buffer(data, np.int16)
+        data[:, :number_of_samples_per_channel] = self._task._generate_codes(number_of_samples_per_channel)
+        return number_of_samples_per_channel
+
+
+stream_readers = SimpleNamespace(AnalogMultiChannelReader=_analog_multi_channel_reader,
+                                 AnalogUnscaledReader=_analog_unscaled_reader)
@@ -6,7 +6,10 @@ Author: Benjamin Bemis Ph.D Student
 
 """
 from pyModbusTCP.client import ModbusClient
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import os
 import time
 import threading
 # import logging # Allows console logging for debugging
@@ -27,79 +30,233 @@ def find_closest_value_index(value, array):
     index = np.abs(array - value).argmin()
     return index
 
+# Regulator calibration made with regulator_response.py (pressure.mat of the run, renamed)
+REGULATOR_CALIBRATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regulator_calibration", "cal_2_5_26.mat")
+
+class regulator_calibration:
+    """
+    Pressure <-> control voltage curve of the pressure regulator, loaded from a calibration .mat file.
+    
+    The file is read once and read again only when its modification time changes, so setting a pressure 
+    does not re-read it. The voltages are de-duplicated keeping the first occurrence (the down sweep of 
+    regulator_response.py, the direction the regulator is used in) and both arrays are sorted so the 
+    curve is monotone for the lookups. The lookups take scalars or arrays, so a whole setpoint plan 
+    is converted in one call.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    path : calibration file with the mean pressure and the control voltage of every step
+    pressure_name : variable of the file with the pressures in kPa
+    voltage_name : variable of the file with the control voltages (percent written to the PLC)
+    """
+    def __init__(self, path=REGULATOR_CALIBRATION, pressure_name="mean_combined_kpa", voltage_name="set_voltage"):
+        self.path = path
+        self.pressure_name = pressure_name
+        self.voltage_name = voltage_name
+        self.pressure = None
+        self.voltage = None
+        self._mtime = None
+    
+    def load(self):
+        """Reads the calibration file if it was not read yet or has changed since."""
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return
+        data = scipy.io.loadmat(self.path)
+        pressure = np.ravel(data[self.pressure_name]).astype(np.float64)
+        voltage = np.ravel(data[self.voltage_name]).astype(np.float64)
+        
+        # remove duplicates, always takes first of duplicates (np.unique returns the voltages sorted)
+        voltage, first = np.unique(voltage, return_index=True)
+        # relationship is linear, inc v -> incr p. interp function requires an increasing function in x
+        self.voltage = voltage
+        self.pressure = np.sort(pressure[first])
+        self._mtime = mtime
+    
+    def voltage_for(self, pressure):
+        """Returns the control voltage (percent) for a pressure or an array of pressures in kPa."""
+        self.load()
+        return np.interp(pressure, self.pressure, self.voltage)
+    
+    def pressure_for(self, voltage):
+        """Returns the pressure in kPa for a control voltage (percent) or an array of them."""
+        self.load()
+        return np.interp(voltage, self.voltage, self.pressure)
+
+regulator = regulator_calibration()    # calibration used by get_set_voltage and view_set_pressure
+
+
 def get_set_voltage(p):  
     """
     Function uses the regulator calibration curve to find the voltage percent to write to the PLC to control the pressure regulator.
-    the filepath to the regulator calibration is hard-coded.
+    the filepath to the regulator calibration is REGULATOR_CALIBRATION (replace plc_functions.regulator to use another one).
     
-    inputs: desired pressure
+    inputs: desired pressure (or an array of pressures)
     outputs: pressure, as a percent
     
+    Updated: 10/18/2026 - the calibration is loaded once (see regulator_calibration)
+    """
+    voltage2set = regulator.voltage_for(p)
+
+    return voltage2set
+
+
+# CLICK PLC (C0-12DRE-D) on the chamber network
+PLC_HOST = "169.254.23.198"
+PLC_PORT = 502
+PLC_UNIT_ID = 1
+
+# PLC outputs (Modbus addresses are 0-based)
+REGULATOR_REGISTER = 0          # regulator control voltage, 1000 x percent (400001)
+TTL_REGISTERS = (1, 2)          # TTL outputs of the laser and camera (400002, 400003)
+TTL_ON = 100                    # register value of a 5V TTL output
+CONTACT_COIL = 16384            # Y1 closed contact (camera trigger)
+
+class plc_client:
     """
+    Long-lived, thread-safe Modbus TCP connection to the PLC shared by every function in this file.
     
-    # specific to regulator, from calibration
-    # =========================================================================
-    calibration = 'C:/Users/Calibration Chamber/Documents/GitHub/ND_calibration_chamber/operations_software/regulator_calibration/cal_2_5_26.mat'
-    data = scipy.io.loadmat(calibration)
-    pressure_cal = data.get('mean_combined_kpa')
-    voltage_vec = data.get('set_voltage')
-    
-    pressure_cal = pressure_cal.tolist()
-    voltage_vec = voltage_vec.tolist()
-    voltages = []
-    
-    # if np array was 2D, might have to take out the second dimension
-    if isinstance(pressure_cal[0],list):
-        pressure_cal = pressure_cal[0]
-        voltage_vec = voltage_vec[0]
-    
-    # remove duplicates, always takes first of duplicates
-    for idx, value in enumerate(voltage_vec):
-        if value not in voltages:
-            voltages.append(value)
-        else:
-            pressure_cal.pop(idx) 
-            voltage_vec.pop(idx)
-            
-    # relationship is linear, inc v -> incr p. interp function requires an increasing function in x
-    pressure_cal.sort(reverse = False) # var.sort(reverse = False) Sorts a list to be in accending order
-    voltage_vec.sort(reverse = False)
-    # =========================================================================
+    The connection is opened on the first request and kept open, so a register write during a trigger 
+    sequence does not wait for a TCP handshake. Requests are serialized with a lock, since the Modbus TCP 
+    connection carries one request at a time. Hold client.lock to send several requests back to back. 
+    A request that fails closes the connection and is retried once on a new one. A background thread 
+    reads a register when the connection has been idle for keepalive seconds, which keeps the PLC from 
+    dropping it and finds a dead link before the next real request.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
     
-    voltage2set = np.interp(p, pressure_cal, voltage_vec)
+    Parameters
+    ----------
+    host, port, unit_id : address of the PLC
+    timeout : longest wait for the answer to one request in seconds
+    keepalive : idle time in seconds before the connection is checked, None to turn the check off
+    retries : number of times a failed request is repeated on a new connection
+    """
+    def __init__(self, host=PLC_HOST, port=PLC_PORT, unit_id=PLC_UNIT_ID, timeout=2.0, keepalive=10.0, retries=1):
+        self.host = host
+        self.port = port
+        self.unit_id = unit_id
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.retries = retries
+        self.last_error = None
+        self._client = None
+        self.lock = threading.RLock()
+        self._last_used = time.monotonic()
+        self._closed = threading.Event()
+        self._keepalive_thread = None
+    
+    def _connection(self):
+        # Opens the connection if there is none (lazy connect)
+        if self._client is None:
+            self._client = ModbusClient(host=self.host, port=self.port, unit_id=self.unit_id, 
+                                        timeout=self.timeout, auto_open=True, auto_close=False)
+            if self.keepalive and self._keepalive_thread is None:
+                self._closed.clear()
+                self._keepalive_thread = threading.Thread(target=self._keep_alive, daemon=True)
+                self._keepalive_thread.start()
+        if not self._client.is_open:
+            self._client.open()
+        return self._client
+    
+    def _disconnect(self):
+        if self._client is not None:
+            self._client.close()
+    
+    def request(self, function, *args):
+        """
+        Sends one request (the name of a pyModbusTCP.client.ModbusClient method and its arguments) and returns 
+        its result: the values read, True for a write, or None/False if it failed after the retries.
+        """
+        with self.lock:
+            result = None
+            for attempt in range(self.retries + 1):
+                client = self._connection()
+                result = getattr(client, function)(*args)
+                self._last_used = time.monotonic()
+                if result is not None and result is not False:
+                    self.last_error = None
+                    return result
+                self.last_error = client.last_error_as_txt
+                # reconnect before trying again, the link may have been dropped
+                self._disconnect()
+            return result
+    
+    def read_holding_registers(self, address, count=1):
+        return self.request("read_holding_registers", address, count)
+    
+    def read_coils(self, address, count=1):
+        return self.request("read_coils", address, count)
+    
+    def write_single_register(self, address, value):
+        return self.request("write_single_register", address, value)
+    
+    def write_single_coil(self, address, value):
+        return self.request("write_single_coil", address, value)
+    
+    def write_multiple_registers(self, address, values):
+        return self.request("write_multiple_registers", address, values)
+    
+    def write_multiple_coils(self, address, values):
+        return self.request("write_multiple_coils", address, values)
+    
+    def _keep_alive(self):
+        while not self._closed.wait(self.keepalive/2):
+            if time.monotonic() - self._last_used < self.keepalive:
+                continue
+            with self.lock:
+                if self._client is None or not self._client.is_open:
+                    continue
+                if self._client.read_holding_registers(0) is None:
+                    self._disconnect()          # the next request reconnects
+                self._last_used = time.monotonic()
+    
+    def close(self):
+        """Closes the connection and stops the keepalive thread (the next request connects again)."""
+        self._closed.set()
+        if self._keepalive_thread is not None:
+            self._keepalive_thread.join()
+            self._keepalive_thread = None
+        with self.lock:
+            self._disconnect()
+            self._client = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
 
-    return voltage2set
+client = plc_client()    # connection used by every function in this file
 
 
 def set_pressure(pressure):
+    """
+    Writes the control voltage for a pressure (kPa) to the regulator output of the PLC.
     
+    Updated: 10/18/2026 - uses the shared PLC connection (client)
+    """
     voltage = get_set_voltage(pressure)
-    c = ModbusClient(host="169.254.23.198", port=502, unit_id=1, auto_open=True)
-    # Open the Modbus connection
-    if c.open():
-        # Define the Modbus address to write to (400001)
-        modbus_address = 0  # Note that Modbus addresses are 0-based, so 400001 becomes 1
-    
-        # Define the data to write (for example, a single integer value)
-        
-        data_to_write = int(1000*voltage) # This multiplication is to get three points of percision. 
-        # Write the data to the specified Modbus address
-        is_success = c.write_single_register(modbus_address, data_to_write)
-    
-        if is_success:
-            # print(f"Successfully wrote {voltage*1e-3} Volts to the PLC. The pressure was set to {place_holder_for_set_pressure}")
-            view_set_pressure()
-            print("="*50)
-            print("\n")
-        else:
-            print(f"Failed to write to the PLC at: {modbus_address}")
-            print("="*50)
-            print("\n")
+    # Define the Modbus address to write to (400001)
+    modbus_address = 0  # Note that Modbus addresses are 0-based, so 400001 becomes 1
+
+    # Define the data to write (for example, a single integer value)
     
-        # Close the Modbus connection
-        c.close()
+    data_to_write = int(1000*voltage) # This multiplication is to get three points of percision. 
+    # Write the data to the specified Modbus address
+    is_success = client.write_single_register(modbus_address, data_to_write)
+
+    if is_success:
+        # print(f"Successfully wrote {voltage*1e-3} Volts to the PLC. The pressure was set to {place_holder_for_set_pressure}")
+        view_set_pressure()
+        print("="*50)
+        print("\n")
     else:
-        print("Unable to open Modbus connection")
+        print(f"Failed to write to the PLC at: {modbus_address} ({client.last_error})")
         print("="*50)
         print("\n")
 
@@ -112,41 +269,14 @@ def view_set_pressure():
     -------
     Current pressure as a float.
     """
-    c = ModbusClient(host="169.254.23.198", port=502, unit_id=1, auto_open=True)
-    set_point = c.read_holding_registers(0)
+    set_point = client.read_holding_registers(0)
+    if set_point is None:
+        print(f"Unable to read the set pressure from the PLC ({client.last_error})")
+        return
     set_point = int(set_point[0])/1000
     print(f"Current Voltage: {set_point/10} V")
     
-    # specific to regulator, from calibration
-    # =========================================================================
-    calibration = 'C:/Users/Calibration Chamber/Documents/GitHub/ND_calibration_chamber/operations_software/regulator_calibration/cal_2_5_26.mat'
-    data = scipy.io.loadmat(calibration)
-    pressure_cal = data.get('mean_combined_kpa')
-    voltage_vec = data.get('set_voltage')
-    
-    pressure_cal = pressure_cal.tolist()
-    voltage_vec = voltage_vec.tolist()
-    voltages = []
-    
-    # if np array was 2D, might have to take out the second dimension
-    if isinstance(pressure_cal[0],list):
-        pressure_cal = pressure_cal[0]
-        voltage_vec = voltage_vec[0]
-    
-    # remove duplicates, always takes first of duplicates
-    for idx, value in enumerate(voltage_vec):
-        if value not in voltages:
-            voltages.append(value)
-        else:
-            pressure_cal.pop(idx) 
-            voltage_vec.pop(idx)
-            
-    # relationship is linear, inc v -> incr p. interp function requires an increasing function in x
-    pressure_cal.sort(reverse = False) # var.sort(reverse = False) Sorts a list to be in accending order
-    voltage_vec.sort(reverse = False)
-    # =========================================================================
-    p = np.interp(set_point, voltage_vec, pressure_cal)
-    c.close()
+    p = regulator.pressure_for(set_point)
     
     print(f"Set Pressure: {p} kPa")
     return 
@@ -157,7 +287,7 @@ def ttl_pulse(register,status):
     This function turns on and off a 5V signal. This can be used to make a square wave for triggering external devices.
     
     Author: Benjamin Bemis 
-    Updated: 1/28/2026
+    Updated: 10/18/2026 - uses the shared PLC connection (client), so the pulse is not delayed by opening a connection
     
     Parameters
     ----------
@@ -176,42 +306,28 @@ def ttl_pulse(register,status):
     
     
     # Base function:    
-    c = ModbusClient(host="169.254.23.198", port=502, unit_id=1, auto_open=True)
-    
-    if c.open(): # this function needs to use the open() command not is_open. They return conflicting booleen logic
-        # Define the Modbus address to write to (400001)
-        modbus_address = register  # Note that Modbus addresses are 0-based, so 400002 becomes 1
-        match status:
-            case 'on':
-                # Define the data to write (for example, a single integer value)
-                data_to_write = 100; # This should write 5V
-            
-                # Write the data to the specified Modbus address
-                is_success = c.write_single_register(modbus_address, data_to_write)
-            case 'off':
-                # Define the data to write (for example, a single integer value)
-                data_to_write = 0; # This should write 0V
-            
-                # Write the data to the specified Modbus address
-                is_success = c.write_single_register(modbus_address, data_to_write)
-            case _:
-                return "You have asked the plc to do something other than on or off."
-        
-    
-        if is_success:
-            print(f"Successfully wrote to the PLC: Modbus address {modbus_address}")
-            print("="*50)
-            print("\n")
-            
-        else:
-            print(f"Failed to write TTL Pulse to Modbus address {modbus_address}")
-            print("="*50)
-            print("\n")
+    # Define the Modbus address to write to (400001)
+    modbus_address = register  # Note that Modbus addresses are 0-based, so 400002 becomes 1
+    match status:
+        case 'on':
+            # Define the data to write (for example, a single integer value)
+            data_to_write = 100; # This should write 5V
+        case 'off':
+            # Define the data to write (for example, a single integer value)
+            data_to_write = 0; # This should write 0V
+        case _:
+            return "You have asked the plc to do something other than on or off."
     
-        # Close the Modbus connection
-        c.close()
+    # Write the data to the specified Modbus address
+    is_success = client.write_single_register(modbus_address, data_to_write)
+
+    if is_success:
+        print(f"Successfully wrote to the PLC: Modbus address {modbus_address}")
+        print("="*50)
+        print("\n")
+        
     else:
-        print("Unable to open Modbus connection")
+        print(f"Failed to write TTL Pulse to Modbus address {modbus_address} ({client.last_error})")
         print("="*50)
         print("\n")
 
@@ -221,7 +337,7 @@ def closed_contact(status):
     Similar to ttl_pulse, This function is to make a closed contact for triggering external devices.
     
     Author: Benjamin Bemis
-    Updated: 1/28/2026
+    Updated: 10/18/2026 - uses the shared PLC connection (client)
         
     Parameters: 
         status - 'on' or 'off'. 'on' will close the normally open contact. 'off' will reopen it.
@@ -229,8 +345,6 @@ def closed_contact(status):
     Return: 
         Print outs to console, the status of the command sent to the PLC.
     '''
-    c = ModbusClient(host="169.254.23.198", port=502, unit_id=1, auto_open=True)
-    
     # For the CLICK PLC model: C0-12DRE-D
     modbus_address = 16384  # Note that Modbus addresses are 0-based, so 16384 becomes 16385 or channel y1 
     match status:
@@ -239,7 +353,7 @@ def closed_contact(status):
             data_to_write = 1; # This is writing a 1 bit (1 is a closed true contact)
         
             # Write the data to the specified Modbus address
-            is_success = c.write_single_coil(modbus_address, data_to_write)
+            is_success = client.write_single_coil(modbus_address, data_to_write)
             print(f"Contact is closed: {modbus_address}")
             print("\n")
         case 'off':
@@ -247,12 +361,11 @@ def closed_contact(status):
             data_to_write = 0; # This is writing a 0 bit
         
             # Write the data to the specified Modbus address
-            is_success = c.write_single_coil(modbus_address, data_to_write)
+            is_success = client.write_single_coil(modbus_address, data_to_write)
             print(f"Contact is open: {modbus_address}")
             print("\n")
         case _:
             return "You have asked the plc to do something other than on or off."
-    c.close() # Close the communication port
     
     if is_success:
         print("="*50)
@@ -262,23 +375,232 @@ def closed_contact(status):
         
     
     else:
-        print("Unable to open Modbus connection")
+        print(f"Unable to write to the PLC ({client.last_error})")
         print("="*50)
         print("\n")
         
         
         
+def plc_snapshot():
+    """
+    Reads the state of every PLC output used by the chamber: the holding registers of the regulator and the TTL outputs 
+    in one read_holding_registers request and the contact in one read_coils request.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Returns
+    -------
+    state : dictionary with "set_voltage" (percent), "set_pressure_kpa" (from the regulator calibration), 
+            "ttl" (register -> True if the output is on), "contact" (True if Y1 is closed) and "registers" (raw values), 
+            or None if the PLC did not answer
+    """
+    with client.lock:
+        registers = client.read_holding_registers(REGULATOR_REGISTER, max(TTL_REGISTERS) - REGULATOR_REGISTER + 1)
+        coils = client.read_coils(CONTACT_COIL)
+    if registers is None or coils is None:
+        print(f"Unable to read the PLC state ({client.last_error})")
+        return None
+    set_voltage = registers[0]/1000
+    return {"set_voltage": set_voltage,
+            "set_pressure_kpa": float(regulator.pressure_for(set_voltage)),
+            "ttl": {register: registers[register - REGULATOR_REGISTER] >= TTL_ON for register in TTL_REGISTERS},
+            "contact": bool(coils[0]),
+            "registers": list(registers)}
+
+
+def _runs(changes):
+    # Splits {address: value} into runs of consecutive addresses, [(first address, [values]), ...]
+    runs = []
+    for address in sorted(changes):
+        if runs and address == runs[-1][0] + len(runs[-1][1]):
+            runs[-1][1].append(changes[address])
+        else:
+            runs.append((address, [changes[address]]))
+    return runs
+
+
+def plc_commit(registers=None, coils=None):
+    """
+    Writes several PLC outputs with as few requests as possible: one write_multiple_registers per run of 
+    consecutive registers and one write_multiple_coils per run of consecutive coils, sent back to back 
+    while holding the connection. For example the regulator (0) and the laser TTL (1) are one request.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    registers : dictionary of holding register address -> value
+    coils : dictionary of coil address -> True/False
+    
+    Returns
+    -------
+    True if every write succeeded.
+    """
+    is_success = True
+    with client.lock:
+        for address, values in _runs(registers or {}):
+            is_success &= bool(client.write_multiple_registers(address, [int(value) for value in values]))
+        for address, values in _runs(coils or {}):
+            is_success &= bool(client.write_multiple_coils(address, [bool(value) for value in values]))
+    if not is_success:
+        print(f"Failed to write to the PLC ({client.last_error})")
+    return is_success
+
+
+class plc_batch:
+    """
+    Collects changes to the PLC outputs and writes them together with plc_commit() at the end of the with block.
+    
+        with plc.plc_batch() as batch:
+            batch.set_pressure(p)            # regulator
+            batch.ttl(laser, "on")           # laser TTL, same request as the regulator
+            batch.contact("on")              # camera contact, one coil request
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    """
+    def __init__(self):
+        self.registers = {}
+        self.coils = {}
+    
+    def set_pressure(self, pressure):
+        """Sets the regulator to a pressure in kPa (see get_set_voltage)."""
+        self.registers[REGULATOR_REGISTER] = int(1000*get_set_voltage(pressure))
+    
+    def ttl(self, register, status):
+        """Turns a TTL output ('on' or 'off') on a register of TTL_REGISTERS."""
+        self.registers[register] = TTL_ON if status == "on" else 0
+    
+    def contact(self, status):
+        """Closes ('on') or opens ('off') the Y1 contact."""
+        self.coils[CONTACT_COIL] = status == "on"
+    
+    def commit(self):
+        is_success = plc_commit(self.registers, self.coils)
+        self.registers = {}
+        self.coils = {}
+        return is_success
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, *exc):
+        # nothing is written if the block failed
+        if exc_type is None:
+            self.commit()
+
+
+# asyncio versions
+# pyModbusTCP has no asyncio client, so each request runs on a worker thread over the shared connection (client). 
+# The event loop is never blocked by the network, and a trigger write, a regulator write and DAQ or TE polling 
+# can be awaited together. The connection lock keeps the requests from mixing on the wire.
+
+async def set_pressure_async(pressure):
+    return await asyncio.to_thread(set_pressure, pressure)
+
+async def view_set_pressure_async():
+    return await asyncio.to_thread(view_set_pressure)
+
+async def ttl_pulse_async(register, status):
+    return await asyncio.to_thread(ttl_pulse, register, status)
+
+async def closed_contact_async(status):
+    return await asyncio.to_thread(closed_contact, status)
+
+async def plc_snapshot_async():
+    return await asyncio.to_thread(plc_snapshot)
+
+async def plc_commit_async(registers=None, coils=None):
+    return await asyncio.to_thread(plc_commit, registers, coils)
+
+
+async def pretrigger_countdown(delay, actions, poll=None, poll_interval=1.0):
+    """
+    Counts down to a collection while running the pretrigger actions at their times and polling instruments.
+    
+    Every action waits for its own deadline measured from the start of the countdown (not from the 
+    previous print), so the laser and camera edges do not drift with the time the PLC writes take.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    delay : seconds until the collection begins
+    actions : dictionary of seconds before the collection -> action, a coroutine function or a function 
+              without arguments, for example {laser_pretrig: lambda: plc.ttl_pulse_async(laser, "on")}
+    poll : function without arguments called every poll_interval seconds during the countdown 
+           (for example te.therm_read), or None
+    poll_interval : seconds between calls of poll
+    
+    Returns
+    -------
+    polled : list of (seconds since the start of the countdown, value returned by poll)
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    
+    async def at(time_left, action):
+        await asyncio.sleep(max(start + delay - time_left - loop.time(), 0))
+        result = action()
+        if asyncio.iscoroutine(result):
+            await result
+    
+    async def countdown():
+        for remaining in range(int(delay), 0, -1):
+            await asyncio.sleep(max(start + delay - remaining - loop.time(), 0))
+            print(f"You have {remaining} seconds till collection begins")
+            print(50*"=")
+        await asyncio.sleep(max(start + delay - loop.time(), 0))
+    
+    polled = []
+    async def polling():
+        count = 0
+        while count*poll_interval < delay:
+            await asyncio.sleep(max(start + count*poll_interval - loop.time(), 0))
+            polled.append((loop.time() - start, await asyncio.to_thread(poll)))
+            count += 1
+    
+    tasks = [countdown()] + [at(time_left, action) for time_left, action in actions.items()]
+    if poll is not None:
+        tasks.append(polling())
+    await asyncio.gather(*tasks)
+    return polled
+
+
+def run_async(coroutine):
+    """
+    Runs a coroutine to the end from synchronous code and returns its result. 
+    Inside a console that already runs an event loop (Spyder/IPython) it is run on a thread with its own loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def pretrigger(delay, actions, poll=None, poll_interval=1.0):
+    """
+    Synchronous version of pretrigger_countdown for the scripts, returns when the collection should begin.
+    """
+    return run_async(pretrigger_countdown(delay, actions, poll, poll_interval))
+
+
 def runOsciloscope(measure_duration, register):
     ttl_pulse(register, status = "on")
     time.sleep(measure_duration)
     ttl_pulse(register, status = "off")
         
-def calibration_chamber_pressure(ni, p, channels, trigger_channel, sample_rate, measure_duration, register):
+def calibration_chamber_pressure(ni, p, channels, trigger_channel, sample_rate, measure_duration, register, session=None, settle_mode=None, settle_time=30, target_sem_kpa=None, triggered=None, line_frequency=None, output_rate=None):
     """
         Setting pressure from a pressure calibration vector to our pressure regulator
         
         Author: Luke Denn
-        Updated: 2/05/2026
+        Updated: 10/18/2026
         
         Arguments:
             ni - this is the class of functions and stored variables belonging to the ni class package created in ni_functions.py
@@ -287,20 +609,62 @@ def calibration_chamber_pressure(ni, p, channels, trigger_channel, sample_rate,
             sample_rate - desired sample rate
             measure_duration - this is number of desired points/sample rate
             register - ends up being the modbus address for the oscilloscope
+            session - optional ni.daq_session that is reused for the measurement instead of setting up the DAQ again
+            settle_mode - "fixed" waits settle_time seconds for the regulator. "adaptive" watches the pressure 
+                          (ni.wait_for_settle) and moves on once it is steady, with settle_time as the maximum wait.
+                          None uses the settle mode given to ni.initialize (fixed by default)
+            settle_time - wait in seconds (maximum wait for "adaptive")
+            target_sem_kpa - if given, each measurement stops once the standard error of the combined pressure is below it
+                             (measure_duration is then the maximum duration, see ni.pressure_read)
+            triggered - if True the DAQ is armed on trigger_channel (PFI0) before the TTL on register is pulsed, 
+                        so the measurement starts on the PLC edge (the register output has to be wired to PFI0). 
+                        None does this only with ni.initialize(start_trigger=...), armed on that channel
+            line_frequency - mains frequency (60 Hz) to average over whole mains cycles, see ni.pressure_read
+            output_rate - rate of the kept samples when sample_rate is oversampled (see ni.plan_sampling and ni.pressure_read)
             
         Outputs:
             there are no outputs, because all of the data is populated into the ni class. each row of the data matrix is a set pressure.
             some rows will have 1 column and some will have enough columns per the data points in the measure duration
     """
     start_time = time.time()
-    device_name = ni.local_sys()
+    if session is not None:
+        device_name = session.device_name
+    else:
+        device_name = ni.local_sys()
+    
+    if settle_mode is None:
+        settle_mode = ni.ni_vars.options["settle_mode"]
+    if triggered is None:
+        triggered = ni.ni_vars.options["start_trigger"] is not None
+        if triggered:
+            trigger_channel = ni.ni_vars.options["start_trigger"]
     
     voltage = get_set_voltage(p)
     set_pressure(voltage)
-    time.sleep(30) # give the regulator time to act
+    match settle_mode: # give the regulator time to act
+        case "adaptive":
+            if session is not None:
+                ni.wait_for_settle(session, timeout=settle_time)
+            else:
+                with ni.daq_session(channels, sample_rate, device_name) as settle_session:
+                    ni.wait_for_settle(settle_session, timeout=settle_time)
+        case _:
+            time.sleep(settle_time)
 
     # collect data and update data storage
-    ni.pressure_read(device_name, channels, trigger_channel, sample_rate, measure_duration)
+    if triggered:
+        # the DAQ is armed first so the acquisition starts on the edge of the TTL pulse
+        read_session = session if session is not None else ni.daq_session(channels, ni.acquisition_rate(len(channels), sample_rate, measure_duration), device_name)
+        try:
+            read_session.arm(trigger_channel)
+            ttl_pulse(register, status="on")
+            ni.pressure_read(device_name, channels, trigger_channel, sample_rate, measure_duration, session=read_session, target_sem_kpa=target_sem_kpa, line_frequency=line_frequency, output_rate=output_rate)
+        finally:
+            ttl_pulse(register, status="off")
+            if session is None:
+                read_session.close()
+    else:
+        ni.pressure_read(device_name, channels, trigger_channel, sample_rate, measure_duration, session=session, target_sem_kpa=target_sem_kpa, line_frequency=line_frequency, output_rate=output_rate)
     ni.update()
     
     end_time = time.time()
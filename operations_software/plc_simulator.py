@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+@author: Benjamin Bemis Ph.D Student
+
+Simulated CLICK PLC (C0-12DRE-D) and pressure regulator. A local Modbus TCP server (pyModbusTCP) stands in for the
+PLC with the same holding registers and coils used by plc_functions: the regulator setpoint (register 0), the TTL outputs
+(registers 1 and 2) and the Y1 contact (coil 16384). A write to the regulator register drives a model of the regulator
+and the chamber, whose pressure is the pressure source of the simulated DAQ (ni_simulator), so a whole run can be
+timed off the bench.
+
+The regulator model maps the control voltage to a pressure with the two branches of a regulator_response.py sweep
+(decreasing and increasing voltage) and a play operator between them for the hysteresis. The chamber follows the
+pressure of the regulator with a first-order lag.
+
+Usage:
+    import ni_functions as ni
+    import ni_simulator as sim
+    import plc_functions as plc
+    import plc_simulator
+
+    ni.use_backend("simulated")
+    with plc_simulator.plc_simulator():          # plc_functions talks to the simulator while the block runs
+        plc.set_pressure(50)
+        with ni.daq_session(channels, sample_rate) as session:
+            ni.wait_for_settle(session)
+"""
+import threading
+import numpy as np
+import scipy.io
+from pyModbusTCP.server import ModbusServer, DataBank
+import ni_simulator as sim
+import plc_functions as plc
+
+
+class regulator_model:
+    """
+    Pressure of the chamber as a function of the simulator time for the control voltages written to the regulator.
+
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+
+    Parameters
+    ----------
+    path : regulator calibration file with a down and up sweep (set_voltage and mean_combined_kpa, see regulator_response.py)
+    time_constant : time constant of the first-order lag of the chamber pressure in seconds
+    hysteresis : if False the pressure only follows the decreasing voltage branch (the one used by plc_functions.regulator)
+    initial_pressure : chamber pressure before the first write in kPa (the top of the regulator calibration, inside the Omega range)
+    """
+    def __init__(self, path=plc.REGULATOR_CALIBRATION, time_constant=4.0, hysteresis=True, initial_pressure=95.0):
+        data = scipy.io.loadmat(path)
+        voltage = np.ravel(data["set_voltage"]).astype(np.float64)
+        pressure = np.ravel(data["mean_combined_kpa"]).astype(np.float64)
+        # the sweep goes down and then back up, it turns at the lowest voltage
+        turn = int(np.argmin(voltage))
+        self.down = self._branch(voltage[:turn + 1], pressure[:turn + 1])
+        self.up = self._branch(voltage[turn:], pressure[turn:]) if hysteresis and turn < len(voltage) - 1 else self.down
+        self.time_constant = time_constant
+        self.voltage = None
+        self._lock = threading.Lock()
+        # pressure steps: time of the step, pressure at the step and pressure approached after it
+        self._times = [-np.inf]
+        self._starts = [initial_pressure]
+        self._targets = [initial_pressure]
+
+    @staticmethod
+    def _branch(voltage, pressure):
+        # increasing voltages for np.interp, the first of repeated voltages is kept
+        voltage, first = np.unique(voltage, return_index=True)
+        return voltage, pressure[first]
+
+    def steady_pressure(self, voltage, previous):
+        """
+        Pressure the regulator settles at for a voltage, coming from the previous settled pressure.
+        The pressure stays where it was as long as it is between the two branches (play operator).
+        """
+        down = np.interp(voltage, *self.down)
+        up = np.interp(voltage, *self.up)
+        return float(np.clip(previous, min(down, up), max(down, up)))
+
+    def set_voltage(self, voltage, t=None):
+        """Writes a control voltage (percent) at simulator time t (now by default)."""
+        t = sim.now() if t is None else t
+        with self._lock:
+            start = float(self._pressure(np.asarray([t]))[0])
+            target = self.steady_pressure(voltage, self._targets[-1])
+            self._times.append(t)
+            self._starts.append(start)
+            self._targets.append(target)
+            self.voltage = voltage
+
+    def _pressure(self, t):
+        times = np.asarray(self._times)
+        step = np.maximum(np.searchsorted(times, t, side="right") - 1, 0)
+        starts = np.asarray(self._starts)[step]
+        targets = np.asarray(self._targets)[step]
+        return targets + (starts - targets)*np.exp(-(t - times[step])/self.time_constant)
+
+    def pressure(self, t):
+        """Chamber pressure in kPa at the simulator times t (the pressure source of ni_simulator)."""
+        t = np.asarray(t, dtype=np.float64)
+        with self._lock:
+            return self._pressure(t)
+
+
+class _plc_data_bank(DataBank):
+    # Registers and coils of the simulated PLC, passing the writes to the regulator model
+    def __init__(self, simulator):
+        super().__init__()
+        self.simulator = simulator
+
+    def on_holding_registers_change(self, address, from_value, to_value, srv_info):
+        self.simulator._output_changed("register", address, to_value)
+
+    def on_coils_change(self, address, from_value, to_value, srv_info):
+        self.simulator._output_changed("coil", address, to_value)
+
+
+class plc_simulator:
+    """
+    Local Modbus TCP server standing in for the PLC and the regulator.
+
+    start() runs the server, makes its regulator model the pressure source of ni_simulator and (with connect=True)
+    points plc_functions.client at it. stop() puts the previous client back. Every change of an output is logged
+    in events with its simulator time, to time trigger sequences and pressure changes.
+
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+
+    Parameters
+    ----------
+    host, port : address of the server (port 502 of the real PLC needs administrator rights, so 5020 by default)
+    regulator : regulator_model, a default one is made if None
+    connect : point plc_functions at the simulator while it runs
+    """
+    def __init__(self, host="127.0.0.1", port=5020, regulator=None, connect=True):
+        self.host = host
+        self.port = port
+        self.regulator = regulator if regulator is not None else regulator_model()
+        self.connect = connect
+        self.events = []            # (simulator time, "register" or "coil", address, value)
+        self.server = ModbusServer(host=host, port=port, no_block=True, data_bank=_plc_data_bank(self))
+        self._previous_client = None
+
+    def _output_changed(self, kind, address, value):
+        t = sim.now()
+        self.events.append((t, kind, address, value))
+        if kind == "register" and address == plc.REGULATOR_REGISTER:
+            self.regulator.set_voltage(value/1000, t)
+
+    def state(self):
+        """Returns the PLC outputs: regulator register, TTL registers and the contact."""
+        data_bank = self.server.data_bank
+        return {"registers": data_bank.get_holding_registers(plc.REGULATOR_REGISTER, max(plc.TTL_REGISTERS) + 1),
+                "contact": data_bank.get_coils(plc.CONTACT_COIL)[0]}
+
+    def start(self):
+        self.server.start()
+        sim.configure(pressure_source=self.regulator.pressure)
+        if self.connect:
+            self._previous_client = plc.client
+            plc.client = plc.plc_client(host=self.host, port=self.port)
+        return self
+
+    def stop(self):
+        if self.connect and self._previous_client is not None:
+            plc.client.close()
+            plc.client = self._previous_client
+            self._previous_client = None
+        self.server.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
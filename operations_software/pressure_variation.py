@@ -19,7 +19,7 @@ Updated: 1/22/2026
 
 import numpy as np
 import os
-from ni_functions import ni
+import ni_functions as ni
 from scipy.io import savemat
 import plc_functions as plc
 import pyfiglet as figlet
@@ -132,35 +132,45 @@ pause = np.linspace(1,delay,delay)
 #         break
 ###########################################
 
-ni.initialize() # initializes variables
+ni.initialize() # initializes variables (the optional acquisition features are keywords of ni.initialize)
+session = ni.daq_session(channels, ni.acquisition_rate(len(channels), sample_rate, measure_duration)) # the DAQ is set up once and reused for every set pressure
+if ni.ni_vars.run_writer is not None:
+    ni.ni_vars.run_writer.write_run_info(p_setpoints=press_set_pts)
 
 for p in press_set_pts:
-    elapsed_time = plc.calibration_chamber_pressure(ni, p, channels, trigger_channel, sample_rate, measure_duration, register)
+    elapsed_time = plc.calibration_chamber_pressure(ni, p, channels, trigger_channel, sample_rate, measure_duration, register, session=session)
 
     new_time = new_time + elapsed_time/60
     total_time = np.append(total_time, new_time)
 
+session.close()
+ni.close_spool()
+ni.close_run_file()
+
 # Saving the various arrays from the data collection as .mat files
-savemat(os.path.join(savepath, "omega.mat"), {"pressure_kpa": ni.ni_vars.all_pressure_omega,
+omega_voltage, mks_voltage = ni.all_voltages()
+omega_kpa, mks_kpa = ni.all_pressures()
+time_vector = ni.all_times()
+savemat(os.path.join(savepath, "omega.mat"), {"pressure_kpa": omega_kpa,
                                               "pressure_kpa_mean": ni.ni_vars.all_pressure_mean_omega,
-                                              "time": ni.ni_vars.all_times_omega,
-                                              "voltage_raw": ni.ni_vars.all_voltage_omega,
+                                              "time": time_vector,
+                                              "voltage_raw": omega_voltage,
                                               "p_setpoints": press_set_pts,
                                               "voltage_raw_mean" : ni.ni_vars.all_voltage_omega_mean,
                                               })
                                               
 savemat(os.path.join(savepath, "mks.mat"), {
-                                              "pressure_mks_kpa": ni.ni_vars.all_pressure_mks,
+                                              "pressure_mks_kpa": mks_kpa,
                                               "pressure_kpa_mks_mean": ni.ni_vars.all_pressure_mean_mks,
-                                              "mks_time": ni.ni_vars.all_times_mks,
-                                              "voltage_mks_raw": ni.ni_vars.all_voltage_mks,
+                                              "mks_time": time_vector,
+                                              "voltage_mks_raw": mks_voltage,
                                               "voltage_raw_mks_mean" : ni.ni_vars.all_voltage_mks_mean
                                               })
 
 savemat(os.path.join(savepath, "pressure.mat"), {
-                                              "all_pressure_kpa": ni.ni_vars.pressure_combined_kpa,
-                                              "all_pressure_uncert": ni.ni_vars.pressure_combined_sigma_kpa,
-                                              "time": ni.ni_vars.all_times_omega,
+                                              "all_pressure_kpa": ni.ni_vars.all_pressure_combined_kpa,
+                                              "all_pressure_uncert": ni.ni_vars.all_pressure_combined_sigma_kpa,
+                                              "time": time_vector,
                                               })
 
 print("="*50)
@@ -211,8 +211,11 @@ trigger = 1           #Modbus register on the plc for the laser (Modbus Register
 # =====================================================
 # Initializing the save variables
 
-ni.initialize() # initializes pressure variables
+ni.initialize() # initializes pressure variables (the optional acquisition features are keywords of ni.initialize)
 te.initialize() # initializes pressure variables
+session = ni.daq_session(channels, ni.acquisition_rate(len(channels), sample_rate, measure_duration)) # the DAQ is set up once and reused for every set point
+if ni.ni_vars.run_writer is not None:
+    ni.ni_vars.run_writer.write_run_info(p_setpoints=press_set_pts, t_setpoints=temp_set_pts)
 
 total_time = np.array([])
 new_time = 0
@@ -232,7 +235,7 @@ for T in temp_set_pts:
     # run through the pressures
     for idx , p in enumerate(press_set_pts):
         plc.set_pressure(p)
-        delay(30)
+        ni.settle(session, 30)                                                 # give the regulator time to act
         
         # elapsed_time = plc.run_PLC_Controller(ni, p, channels, trigger_channel, sample_rate, measure_duration, trigger)
         # new_time = new_time + elapsed_time/60
@@ -243,27 +246,17 @@ for T in temp_set_pts:
         #=============================================================================
         #       Completed block for automated camera and laser triggering
  
-        time_elapse = 0
-        # print("Turn on the Laser! and prep the camera")
-        start = time.time()
-        while time_elapse < delay:
-            print(f"You have {(delay)-time_elapse} seconds till collection begins")
-            print(50*"=")
-            time.sleep(1)
-            time_elapse = int(time.time()-start)
-            if delay - time_elapse == laser_pretrig:
-                plc.ttl_pulse(trigger,status = "on")
-                print("Laser triggered. \n")
-            elif delay - time_elapse == camera_pretrig:
-                plc.closed_contact(status = "on")
-                print("Camera triggered. \n")
+        ni.arm_trigger(session)                                                # with a start trigger the DAQ starts on the camera trigger edge
+        
+        # Countdown with the laser and the camera triggered at their pretrigger times (the PLC writes do not hold up the countdown)
+        plc.pretrigger(delay, {laser_pretrig: lambda: plc.ttl_pulse_async(trigger, "on"),
+                               camera_pretrig: lambda: plc.closed_contact_async("on")})
              
 
         print("Collection has begun:")
         print("="*50)
-        device_name = ni.local_sys()
         temp_before_collection = te.therm_read()
-        ni.pressure_read(device_name, channels, trigger_channel, sample_rate, measure_duration)
+        ni.pressure_read(session.device_name, channels, trigger_channel, sample_rate, measure_duration, session=session)
         temp_after_collection = te.therm_read()
         print("Collection has ended:")
         print("="*50)
@@ -273,11 +266,14 @@ for T in temp_set_pts:
         # update values ##########################
         ni.update()
         te.update(avg_temp_col)
+        if ni.ni_vars.run_writer is not None:
+            ni.ni_vars.run_writer.write_te(te.te_vars, avg_temp_col)
         ##########################################
         
-        # Turning off the camera and the laser
-        plc.ttl_pulse(trigger, status = "off")
-        plc.closed_contact(status = "off")
+        # Turning off the camera and the laser (both outputs in one batch)
+        with plc.plc_batch() as batch:
+            batch.ttl(trigger, "off")
+            batch.contact("off")
        #==============================================================================
         
     print(f"Data for temperature setpoint: {T} has been collected")
@@ -295,6 +291,9 @@ if len(press_set_pts) > 1:
     error = [abs(press_set_pts[idx] - value) for idx, value in enumerate(all_pressure_mean_omega_array)]
     plt.errorbar(total_time, press_set_pts, yerr = error, xerr = None, marker = 'o')
         
+session.close()                                                                # Releases the DAQ
+ni.close_spool()
+ni.close_run_file()
 te.output_enable("off")                                                        # Turns the TE off
 print("The TE has been shutoff.")
 print("="*50)
@@ -310,7 +309,7 @@ savemat(os.path.join(savepath, "te.mat"), {
 savemat(os.path.join(savepath, "pressure.mat"), {
                                               "all_pressure_kpa": ni.ni_vars.all_pressure_weightedAvg_kpa,
                                               "all_pressure_uncert": ni.ni_vars.all_pressure_weighted_uncert_kpa,
-                                              "time": ni.ni_vars.all_times_omega,
+                                              "time": ni.all_times(),
                                               })
 print("="*50)
 print(f"Data has been saved to this directory: {savepath}")
@@ -76,36 +76,28 @@ trigger = 1           #Modbus register on the plc for the laser (Modbus Register
 # =====================================================
 # Initializing the save variables
 
-ni.initialize() # initializes pressure variables
+ni.initialize() # initializes pressure variables (the optional acquisition features are keywords of ni.initialize)
+if ni.ni_vars.run_writer is not None:
+    ni.ni_vars.run_writer.write_run_info(set_voltage=v_cycle)
 
-device_name = ni.local_sys()
+session = ni.daq_session(channels, ni.acquisition_rate(len(channels), sample_rate, delay/2)) # the DAQ is set up once and reused for every voltage
 
 for v in v_cycle:
     plc.set_pressure(v)
     if v < 15.5:
-        time.sleep(6*delay)
+        wait = 6*delay
     else:
-        time.sleep(delay+5) # this is the time to wait for steady pressure readings. 
+        wait = delay+5 # this is the time to wait for steady pressure readings. 
+    ni.settle(session, wait)
         
-    ni.pressure_read(device_name, channels, trigger_channel, sample_rate,delay/2)
+    ni.pressure_read(session.device_name, channels, trigger_channel, sample_rate,delay/2, session=session)
     
     # Updating output variables
-    ni.ni_vars.all_times_omega = np.concatenate([ni.ni_vars.all_times_omega, ni.ni_vars.time_vector], axis=0)
-    ni.ni_vars.all_pressure_omega = np.concatenate([ni.ni_vars.all_pressure_omega, ni.ni_vars.pressure_kpa], axis=0)
-    ni.ni_vars.all_pressure_mean_omega = np.concatenate([ni.ni_vars.all_pressure_mean_omega, np.array([ni.ni_vars.pressure_kpa_mean])], axis=0)
-    ni.ni_vars.all_voltage_omega = np.concatenate([ni.ni_vars.all_voltage_omega, ni.ni_vars.raw_voltage], axis=0)
-    
-    ni.ni_vars.all_times_mks = np.concatenate([ni.ni_vars.all_times_mks, ni.ni_vars.mks_time_vector], axis=0)
-    ni.ni_vars.all_pressure_mks = np.concatenate([ni.ni_vars.all_pressure_mks, ni.ni_vars.mks_pressure_kpa], axis=0)
-    ni.ni_vars.all_pressure_mean_mks = np.concatenate([ni.ni_vars.all_pressure_mean_mks, np.array([ni.ni_vars.mks_pressure_kpa_mean])], axis=0)
-    ni.ni_vars.all_voltage_mks = np.concatenate([ni.ni_vars.all_voltage_mks, ni.ni_vars.mks_raw_voltage], axis=0)
-    
-    ni.ni_vars.all_pressure_combined_kpa = np.concatenate([ni.ni_vars.all_pressure_combined_kpa, np.array([ni.ni_vars.pressure_combined_kpa])], axis=0)
-    ni.ni_vars.all_pressure_combined_sigma_kpa = np.concatenate([ni.ni_vars.all_pressure_combined_sigma_kpa,np.array([ni.ni_vars.pressure_combined_sigma_kpa])], axis=0)
-    
-    ni.ni_vars.all_voltage_omega_mean = np.concatenate([ni.ni_vars.all_voltage_omega_mean, np.array([np.mean(ni.ni_vars.raw_voltage)])], axis=0)
-    ni.ni_vars.all_voltage_mks_mean = np.concatenate([ni.ni_vars.all_voltage_mks_mean, np.array([np.mean(ni.ni_vars.mks_raw_voltage)])], axis=0)
+    ni.update()
     
+session.close()
+ni.close_spool()
+ni.close_run_file()
 
 # Saving calibration to savepath    
 savemat(os.path.join(savepath, "pressure.mat"), {
@@ -113,7 +105,7 @@ savemat(os.path.join(savepath, "pressure.mat"), {
                                               "mean_mks_pressure_kpa": ni.ni_vars.all_pressure_mean_mks,
                                               "mean_combined_kpa": ni.ni_vars.all_pressure_combined_kpa,
                                               "mean_combined_sigma_kpa": ni.ni_vars.all_pressure_combined_sigma_kpa,
-                                              "time": ni.ni_vars.all_times_omega,
+                                              "time": ni.all_times(),
                                               "set_voltage": v_cycle,
                                               })
 print("="*50)
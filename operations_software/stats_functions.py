@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+@author: Benjamin Bemis Ph.D Student
+
+This function list defines running (online) statistics that are updated block by block as the
+data comes off the DAQ, so the raw samples do not have to be kept to get the results.
+"""
+import warnings
+import numpy as np
+from scipy.signal import get_window
+
+
+class online_stats:
+    """
+    Running count, mean, variance, minimum and maximum of one or more channels in constant memory.
+
+    Each block is reduced with NumPy and merged into the running values with the parallel form of
+    Welford's update (Chan et al.), which stays accurate over long runs unlike summing x and x**2.
+
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+
+    Parameters
+    ----------
+    n_channels : number of channels (rows of the blocks passed to update)
+    """
+    def __init__(self, n_channels=1):
+        self.count = 0
+        self.mean = np.zeros(n_channels)
+        self.min = np.full(n_channels, np.inf)
+        self.max = np.full(n_channels, -np.inf)
+        self._m2 = np.zeros(n_channels)
+
+    def update(self, block):
+        """
+        Adds a block with the shape (channels, samples). A 1D block or a scalar is taken as
+        samples of a single channel.
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim < 2:
+            block = block.reshape(len(self.mean), -1)
+        n = block.shape[1]
+        if n == 0:
+            return
+
+        block_mean = np.mean(block, axis=1)
+        block_m2 = np.sum((block - block_mean[:, None])**2, axis=1)
+
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean = self.mean + delta*(n/total)
+        self._m2 = self._m2 + block_m2 + delta**2*(self.count*n/total)
+        self.min = np.minimum(self.min, np.min(block, axis=1))
+        self.max = np.maximum(self.max, np.max(block, axis=1))
+        self.count = total
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1) of each channel."""
+        if self.count < 2:
+            return np.full(len(self.mean), np.nan)
+        return self._m2/(self.count - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def sem(self):
+        """Standard error of the mean of each channel (assumes independent samples)."""
+        return np.sqrt(self.variance/self.count)
+
+
+class welch_psd:
+    """
+    Running Welch power spectral density of one or more channels.
+
+    The blocks are cut into overlapping windowed segments as they arrive and the power of each segment is
+    added to a running sum, so only the end of the last block (less than one segment) is kept between blocks.
+    The result is the same as scipy.signal.welch over the whole measurement (one-sided density, mean detrending).
+
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+
+    Parameters
+    ----------
+    n_channels : number of channels (rows of the blocks passed to update)
+    sample_rate : sample rate in Hz
+    segment_length : samples per segment, the frequency resolution is sample_rate/segment_length
+    overlap : fraction of a segment shared with the next one (0.5 for Welch's method with a Hann window)
+    window : window of each segment, any name accepted by scipy.signal.get_window
+    """
+    def __init__(self, n_channels=1, sample_rate=1.0, segment_length=1024, overlap=0.5, window="hann"):
+        self.sample_rate = float(sample_rate)
+        self.segment_length = int(segment_length)
+        self.step = max(self.segment_length - int(overlap*self.segment_length), 1)
+        self.window = get_window(window, self.segment_length)
+        self.segments = 0
+        self._power = np.zeros((n_channels, self.segment_length//2 + 1))
+        self._tail = np.zeros((n_channels, 0))
+
+    def update(self, block):
+        """
+        Adds a block with the shape (channels, samples). A 1D block is taken as samples of a single channel.
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim < 2:
+            block = block.reshape(len(self._power), -1)
+        data = np.concatenate([self._tail, block], axis=1)
+        n_segments = (data.shape[1] - self.segment_length)//self.step + 1 if data.shape[1] >= self.segment_length else 0
+        if n_segments > 0:
+            # (channels, segments, segment_length) view of the data, no copy
+            segments = np.lib.stride_tricks.sliding_window_view(data, self.segment_length, axis=1)[:, :n_segments*self.step:self.step]
+            segments = (segments - np.mean(segments, axis=2, keepdims=True))*self.window
+            self._power += np.sum(np.abs(np.fft.rfft(segments, axis=2))**2, axis=1)
+            self.segments += n_segments
+        # samples that are part of the next segment
+        self._tail = data[:, n_segments*self.step:].copy()
+
+    @property
+    def frequency(self):
+        """Frequency of each bin in Hz."""
+        return np.fft.rfftfreq(self.segment_length, 1/self.sample_rate)
+
+    @property
+    def psd(self):
+        """One-sided power spectral density of each channel (units**2/Hz) with the shape (channels, bins)."""
+        if self.segments == 0:
+            return np.full(self._power.shape, np.nan)
+        psd = self._power/(self.segments*self.sample_rate*np.sum(self.window**2))
+        # the power of the negative frequencies is folded onto the positive ones
+        psd[:, 1:(self.segment_length + 1)//2] *= 2
+        return psd
+
+    def noise_summary(self, line_frequency=60.0, harmonics=5):
+        """
+        Noise floor of each channel from the spectrum.
+
+        Parameters
+        ----------
+        line_frequency : mains frequency in Hz
+        harmonics : number of multiples of line_frequency (including the fundamental) counted as line pickup
+
+        Returns
+        -------
+        summary : dictionary of arrays with one value per channel:
+                  "noise_floor" median density without the DC bin (units**2/Hz, the broadband floor),
+                  "noise_rms" rms of the signal without its mean (units),
+                  "line_rms" rms in the bins of the line frequency and its harmonics (units), nan if the 
+                             frequency resolution cannot tell the line frequency from DC,
+                  "peak_frequency" frequency of the largest bin without the DC bin (Hz)
+        """
+        psd = self.psd
+        frequency = self.frequency
+        df = self.sample_rate/self.segment_length
+        line_bins = np.zeros(len(frequency), dtype=bool)
+        for k in range(1, harmonics + 1):
+            if k*line_frequency < frequency[-1]:
+                # the main lobe of the Hann window spreads a line over the neighbouring bins
+                line_bins |= np.abs(frequency - k*line_frequency) <= 1.5*df
+        # the DC bin is the offset of the signal, not pickup
+        line_bins[0] = False
+        line_rms = np.sqrt(np.sum(psd[:, line_bins], axis=1)*df)
+        if line_frequency <= 1.5*df:
+            warnings.warn(f"The PSD resolution ({df:.1f} Hz) is too coarse to separate {line_frequency} Hz from DC, "
+                          f"use a segment_length above {int(np.ceil(1.5*self.sample_rate/line_frequency))}")
+            line_rms = np.full(len(psd), np.nan)
+        return {"noise_floor": np.median(psd[:, 1:], axis=1),
+                "noise_rms": np.sqrt(np.sum(psd[:, 1:], axis=1)*df),
+                "line_rms": line_rms,
+                "peak_frequency": frequency[1:][np.argmax(psd[:, 1:], axis=1)] if self.segments else np.full(len(psd), np.nan)}
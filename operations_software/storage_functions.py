@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+@author: Benjamin Bemis Ph.D Student
+
+This function list defines the data storage used by ni_functions and te_functions
+to hold the records of a run until they are written to file, the lazy time axis of the
+recorded blocks and the raw sample spool that writes DAQ blocks straight to disk.
+"""
+import json
+import os
+import numpy as np
+
+
+class sample_store:
+    """
+    Growable array for accumulating samples over a run.
+
+    The data is held in one contiguous buffer that doubles its capacity when it runs out of room,
+    so appending is amortized O(1) instead of re-copying the whole history with np.concatenate
+    at every setpoint. view() returns the filled part of the buffer without copying.
+
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+
+    Parameters
+    ----------
+    dtype : data type of the stored samples (float64 by default)
+    capacity : initial number of rows to allocate
+    """
+    def __init__(self, dtype=np.float64, capacity=1024):
+        self.dtype = np.dtype(dtype)
+        self.capacity = int(capacity)
+        self.row_shape = None           # set by the first append (() for 1D data)
+        self.size = 0
+        self._buffer = None
+
+    def append(self, values):
+        """
+        Appends samples along the first axis. Scalars are stored as a single sample.
+        To store a whole vector as one row (2D store) pass it as [values].
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        if values.ndim == 0:
+            values = values.reshape(1)
+
+        if self._buffer is None:
+            self.row_shape = values.shape[1:]
+            self._buffer = np.empty((max(self.capacity, len(values)),) + self.row_shape, dtype=self.dtype)
+        elif values.shape[1:] != self.row_shape:
+            raise ValueError(f"Expected rows of shape {self.row_shape}, got {values.shape[1:]}")
+
+        n = len(values)
+        if self.size + n > len(self._buffer):
+            self._grow(self.size + n)
+        self._buffer[self.size:self.size + n] = values
+        self.size += n
+
+    def _grow(self, required):
+        capacity = len(self._buffer)
+        while capacity < required:
+            capacity *= 2
+        buffer = np.empty((capacity,) + self.row_shape, dtype=self.dtype)
+        buffer[:self.size] = self._buffer[:self.size]
+        self._buffer = buffer
+
+    def view(self):
+        """
+        Returns the stored samples as a contiguous array. This is a view into the buffer, no copy is made.
+        The view stays valid after later appends but will not show the new samples.
+        """
+        if self._buffer is None:
+            return np.array([], dtype=self.dtype)
+        return self._buffer[:self.size]
+
+    def clear(self):
+        self.size = 0
+        self.row_shape = None
+        self._buffer = None
+
+    @property
+    def nbytes(self):
+        """Memory allocated by the store in bytes (including unused capacity)."""
+        if self._buffer is None:
+            return 0
+        return self._buffer.nbytes
+
+    def __len__(self):
+        return self.size
+
+
+class time_base:
+    """
+    Time axis of a block of evenly sampled data, kept as the start time, sample rate and number of samples 
+    instead of a float64 array of every sample time. The times are only made when they are asked for 
+    (times() or np.asarray(time_base)), so a time base costs the same memory for any duration.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    t0 : time of the first sample in seconds
+    rate : sample rate in Hz
+    n : number of samples
+    """
+    def __init__(self, t0, rate, n):
+        self.t0 = float(t0)
+        self.rate = float(rate)
+        self.n = int(n)
+        
+    def times(self):
+        """Returns the time of every sample (t0 + i/rate for i in range(n))."""
+        return self.t0 + np.arange(self.n)/self.rate
+    
+    def as_row(self):
+        """Returns (t0, rate, n) as a row for a sample_store."""
+        return np.array([self.t0, self.rate, self.n], dtype=np.float64)
+    
+    @property
+    def duration(self):
+        return self.n/self.rate
+    
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.times(), dtype=dtype)
+    
+    def __len__(self):
+        return self.n
+    
+    def __repr__(self):
+        return f"time_base(t0={self.t0}, rate={self.rate}, n={self.n})"
+
+
+def expand_time_bases(rows):
+    """
+    Makes the times of a series of blocks from their (t0, rate, n) rows, one block after the other.
+    """
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, 3)
+    if len(rows) == 0:
+        return np.array([], dtype=np.float64)
+    return np.concatenate([time_base(t0, rate, n).times() for t0, rate, n in rows])
+
+
+class raw_spool:
+    """
+    Spools raw DAQ blocks straight to a memory-mapped file on disk as they arrive, instead of keeping them in RAM.
+    
+    The samples are stored as (samples, channels) in a preallocated binary file (int16 ADC codes, float32 or float64 volts). 
+    ADC code blocks written to a float32 or float64 spool are scaled to volts with the scaling polynomials first. 
+    If the file fills up its size is doubled. A small JSON index next to it (<path>.json) holds the 
+    channel names, data type, sample rate, scaling and the sample ranges of each setpoint. 
+    The index is rewritten at every setpoint so a crash loses at most the current setpoint.
+    Use open_spool() to read it back without loading everything into memory.
+    
+    Author: Benjamin Bemis
+    Updated: 10/18/2026
+    
+    Parameters
+    ----------
+    path : file to write the samples to
+    channel_names : names of the channels (columns)
+    sample_rate : sample rate per channel in Hz
+    dtype : "int16", "float32" or "float64"
+    capacity : number of samples per channel to preallocate
+    scaling : scaling polynomial of each channel from ADC codes to volts (volts = c0 + c1*code + ...), saved in the index. 
+              Needed to spool code blocks to a float32 or float64 file.
+    """
+    def __init__(self, path, channel_names, sample_rate, dtype="float32", capacity=int(1e6), scaling=None):
+        self.path = path
+        self.channel_names = list(channel_names)
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.scaling = scaling
+        self.size = 0
+        self.setpoints = []         # [start, stop) sample ranges of each setpoint
+        self._map(max(int(capacity), 1), mode="w+")
+        self.write_index()
+        
+    def _map(self, capacity, mode="r+"):
+        self.capacity = capacity
+        if mode == "r+":
+            with open(self.path, "r+b") as file:
+                file.truncate(capacity*len(self.channel_names)*self.dtype.itemsize)
+        self.data = np.memmap(self.path, dtype=self.dtype, mode=mode, shape=(capacity, len(self.channel_names)))
+        
+    def append(self, block):
+        """
+        Writes a block with the shape (channels, samples) to the file.
+        """
+        block = np.asarray(block)
+        if np.issubdtype(block.dtype, np.integer) and np.issubdtype(self.dtype, np.floating):
+            # ADC codes to a file of volts
+            if self.scaling is None:
+                raise ValueError(f"Cannot spool ADC codes to a {self.dtype} file without the scaling to volts")
+            block = np.stack([np.polynomial.polynomial.polyval(row.astype(np.float64), coeff) 
+                              for row, coeff in zip(block, self.scaling)])
+        elif not np.can_cast(block.dtype, self.dtype, casting="safe" if np.issubdtype(self.dtype, np.integer) else "same_kind"):
+            raise TypeError(f"Cannot spool {block.dtype} samples to a {self.dtype} file")
+        n = block.shape[1]
+        if self.size + n > self.capacity:
+            capacity = self.capacity
+            while capacity < self.size + n:
+                capacity *= 2
+            self.data.flush()
+            del self.data
+            self._map(capacity)
+        self.data[self.size:self.size + n] = block.T
+        self.size += n
+    
+    def mark_setpoint(self, start, stop=None, summary=None):
+        """
+        Adds the sample range [start, stop) of a setpoint to the index (stop defaults to the current size).
+        The summary passed by ni_functions.update() is not stored, the spool only holds the raw samples.
+        """
+        if stop is None:
+            stop = self.size
+        self.setpoints.append([int(start), int(stop)])
+        self.data.flush()
+        self.write_index()
+        
+    def write_index(self):
+        index = {"channel_names": self.channel_names,
+                 "dtype": self.dtype.name,
+                 "sample_rate": self.sample_rate,
+                 "samples": self.size,
+                 "setpoints": self.setpoints,
+                 # the samples of a float spool are already volts
+                 "scaling": self.scaling if np.issubdtype(self.dtype, np.integer) else None}
+        with open(self.path + ".json", "w") as file:
+            json.dump(index, file, indent=1)
+    
+    def close(self):
+        """
+        Writes the index and trims the unused part of the file.
+        """
+        self.data.flush()
+        del self.data
+        with open(self.path, "r+b") as file:
+            file.truncate(self.size*len(self.channel_names)*self.dtype.itemsize)
+        self.capacity = self.size
+        self.write_index()
+        
+    @property
+    def nbytes(self):
+        """Size of the spool file in bytes (including unused capacity)."""
+        return self.capacity*len(self.channel_names)*self.dtype.itemsize
+
+
+def open_spool(path):
+    """
+    Opens a spool written by raw_spool without reading it into memory.
+
+    Returns
+    -------
+    data : read-only np.memmap with the shape (samples, channels)
+    index : dictionary from the JSON index (channel_names, dtype, sample_rate, samples, setpoints, scaling)
+    """
+    with open(path + ".json") as file:
+        index = json.load(file)
+    n_channels = len(index["channel_names"])
+    if index["samples"] == 0 or os.path.getsize(path) == 0:
+        return np.zeros((0, n_channels), dtype=index["dtype"]), index
+    data = np.memmap(path, dtype=index["dtype"], mode="r", shape=(index["samples"], n_channels))
+    return data, index
@@ -17,6 +17,7 @@ import serial
 from serial.tools.list_ports import comports
 import time
 import numpy as np
+from storage_functions import sample_store
 
 class te_vars:
     def __init__(self):
@@ -27,20 +28,33 @@ class te_vars:
         self.all_times_te = None
         self.all_temps_te = None
         self.all_avg_temp = None
+        self.stores = {}
         self.comport = None
         
         
 def initialize():
-    te_vars.all_times_te = np.array([])
-    te_vars.all_temps_te = np.array([])
-    te_vars.all_avg_temp = np.array([])
+    te_vars.stores = {"all_times_te": sample_store(),
+                      "all_temps_te": sample_store(),
+                      "all_avg_temp": sample_store()}
+    _refresh_views()
     te_vars.comport = get_device()
     
+def _refresh_views():
+    for name, store in te_vars.stores.items():
+        setattr(te_vars, name, store.view())
+    
 def update(avg_temp_col):
-    te_vars.all_avg_temp  = np.concatenate([te_vars.all_avg_temp, np.array([avg_temp_col])], axis=0)
-        
-    te_vars.all_times_te = np.concatenate([te_vars.all_times_te, np.array([te_vars.times])], axis=0)
-    te_vars.all_temps_te = np.concatenate([te_vars.all_temps_te, np.array([te_vars.temps])], axis=0)
+    # The temperature histories of each setpoint are stored one after the other (as with the pressure records)
+    te_vars.stores["all_avg_temp"].append(avg_temp_col)
+    te_vars.stores["all_times_te"].append(te_vars.times)
+    te_vars.stores["all_temps_te"].append(te_vars.temps)
+    _refresh_views()
+    
+def memory_footprint():
+    """
+    Returns the memory (in bytes) allocated for the run records.
+    """
+    return sum(store.nbytes for store in te_vars.stores.values())
         
 def get_device(): 
     """
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+The modules of operations_software are imported flat (import ni_functions as ni), as in the scripts.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the HDF5 run file (hdf5_functions).
+"""
+import os
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+h5py = pytest.importorskip("h5py")
+import hdf5_functions as h5
+
+
+def test_te_ranges_of_collections_longer_than_the_window(tmp_path):
+    # set_output_ss_monitor keeps every reading in temps but times is only the last `length` of them (counter > length)
+    collections = [SimpleNamespace(times=np.linspace(15, 25, 10), temps=np.arange(25.0)),
+                   SimpleNamespace(times=np.linspace(30, 40, 10), temps=np.arange(100.0, 140.0))]
+    path = os.path.join(tmp_path, "run.h5")
+    with h5.run_writer(path) as writer:
+        for te_vars in collections:
+            writer.write_te(te_vars, float(np.mean(te_vars.temps)))
+
+    te = h5.read_run(path)["te"]
+    for row, te_vars in enumerate(collections):
+        start, stop = te["times_range"][row]
+        np.testing.assert_array_equal(te["times"][start:stop], te_vars.times)
+        start, stop = te["temps_range"][row]
+        np.testing.assert_array_equal(te["temps"][start:stop], te_vars.temps)
+
+
+def test_run_file_option_writes_every_setpoint(tmp_path):
+    import ni_functions as ni
+    import ni_simulator as sim
+    channels = {"omega_channel": "ai0", "mks_channel": "ai3"}
+    ni.use_backend("simulated")
+    sim.configure(time_scale=0, pressure_source=lambda t: 50.0 + 0*t)
+    path = os.path.join(tmp_path, "run.h5")
+    ni.initialize(run_file=path, psd_segment_length=128)
+    with ni.daq_session(channels, 1000) as session:
+        for _ in range(2):
+            ni.pressure_read(session.device_name, channels, "PFI0", 1000, 0.5, session=session)
+            ni.update()
+    ni.close_run_file()
+
+    run = h5.read_run(path)
+    np.testing.assert_array_equal(run["range"], [[0, 500], [500, 1000]])
+    np.testing.assert_allclose(run["setpoints"]["pressure_combined_kpa"], ni.ni_vars.all_pressure_combined_kpa)
+    # the PSD of every setpoint, with its frequency axis written once
+    assert run["setpoints"]["psd"].shape == (2, 2, 65)
+    np.testing.assert_array_equal(run["psd_frequency"], ni.ni_vars.psd_frequency)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the Kulite calibration from the scope captures (kulite_functions).
+"""
+import os
+import numpy as np
+import pytest
+import kulite_functions as kulite
+
+
+def write_capture(path, voltage):
+    with open(path, "w") as file:
+        file.write("LECROYWR\nSegments,1,SegmentSize,5\nTime,Ampl\n")
+        for sample, value in enumerate(voltage):
+            file.write(f"{sample*1e-3},{value}\n")
+
+
+def test_captures_read_in_capture_order(tmp_path):
+    # C1--run--00010 sorts before C1--run--00002 as text, not as a capture number
+    for number, level in ((10, 3.0), (2, 1.0), (5, 2.0)):
+        write_capture(os.path.join(tmp_path, f"C1--run--{number:05d}.txt"), np.full(5, level))
+    paths = kulite.scope_files(tmp_path)
+    traces = kulite.read_scope_traces(paths)
+    np.testing.assert_allclose(traces["mean"], [1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(traces["count"], [5, 5, 5])
+
+
+def test_calibration_recovers_a_linear_kulite():
+    pressure_kpa = np.linspace(5, 100, 11)
+    voltage = 0.02 + pressure_kpa/50
+    calibration = kulite.kulite_calibration(voltage, pressure_kpa)
+    assert calibration["slope"] == pytest.approx(50.0)
+    assert calibration["offset"] == pytest.approx(-1.0)
+    assert len(calibration["voltage"]) == 9
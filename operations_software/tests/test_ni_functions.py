@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of ni_functions, the acquisition on the simulated DAQ (ni_simulator).
+"""
+import os
+import numpy as np
+import pytest
+import ni_functions as ni
+import ni_simulator as sim
+from storage_functions import open_spool
+
+CHANNELS = {"omega_channel": "ai0", "mks_channel": "ai3"}
+
+
+@pytest.fixture(autouse=True)
+def simulated_daq():
+    ni.use_backend("simulated")
+    sim.configure(time_scale=0, pressure_source=lambda t: 50.0 + 0*t)
+    ni.initialize()
+
+
+def test_array_weighted_average_matches_the_scalar_path():
+    # Omega readings across the MKS only, blended and Omega only ranges, MKS readings across its sigma bands
+    omega_pa = np.linspace(0, 20e3, 401)
+    mks_pa = np.geomspace(1e-2, 2e4, 401)
+    p_combined, sigma = ni.get_weighted_avg_pressure_array(mks_pa, omega_pa)
+    expected = np.array([ni.get_weighted_avg_pressure(mks, omega) for mks, omega in zip(mks_pa, omega_pa)])
+    # the same branch for every sample, the arithmetic only differs by rounding (x*x against the scalar x**2)
+    np.testing.assert_allclose(p_combined, expected[:, 0], rtol=1e-15)
+    np.testing.assert_allclose(sigma, expected[:, 1], rtol=1e-15)
+
+
+def test_session_reused_across_reads(monkeypatch):
+    with ni.daq_session(CHANNELS, 1000) as session:
+        def no_device_search(*args, **kwargs):
+            raise AssertionError("a given session does not look for the DAQ again")
+        monkeypatch.setattr(ni, "local_sys", no_device_search)
+        for _ in range(2):
+            ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, 0.5, session=session)
+            ni.update()
+    assert len(ni.ni_vars.all_pressure_combined_kpa) == 2
+    assert ni.ni_vars.all_pressure_combined_kpa == pytest.approx([50.0, 50.0], abs=0.5)
+
+
+def test_adaptive_settle_stops_once_the_pressure_is_steady():
+    sim.configure(pressure_source=lambda t: 20.0 + 30.0*np.exp(-t/2.0))
+    ni.initialize(settle_mode="adaptive")
+    with ni.daq_session(CHANNELS, 1000) as session:
+        start = sim.now()
+        ni.settle(session, 60)
+        assert sim.now() - start < 30
+
+
+def test_sequential_read_stops_at_the_target_sem():
+    ni.initialize(target_sem_kpa=0.05)
+    with ni.daq_session(CHANNELS, 1000) as session:
+        ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, 10.0, session=session)
+    assert ni.ni_vars.pressure_combined_sem_kpa <= 0.05
+    assert ni.ni_vars.measure_duration < 10.0
+
+
+def test_partial_last_block():
+    with ni.daq_session(CHANNELS, 1000) as session:
+        blocks = [block.copy() for block in session.blocks(100, total_samples=250)]
+    assert [block.shape for block in blocks] == [(2, 100), (2, 100), (2, 50)]
+    assert all(block.dtype == np.int16 for block in blocks)
+
+
+def test_pressure_read_duration_not_a_multiple_of_the_block():
+    with ni.daq_session(CHANNELS, 1000) as session:
+        ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, 2.05, session=session)
+    ni.update()
+    assert ni.ni_vars.stats.count == 2050
+    assert ni.ni_vars.pressure_combined_kpa == pytest.approx(50.0, abs=0.5)
+
+
+def test_simulated_reader_rejects_strided_buffers():
+    with ni.daq_session(CHANNELS, 1000) as session:
+        block = np.empty((2, 100), dtype=np.int16)
+        with pytest.raises(ValueError):
+            session._read(block[:, :50], 50, 10)
+
+
+def test_default_pressure_inside_the_omega_range():
+    plc_simulator = pytest.importorskip("plc_simulator")
+    sim.configure(pressure_source=plc_simulator.regulator_model().pressure, time_scale=0)
+    with ni.daq_session(CHANNELS, 1000) as session:
+        block = next(iter(session.blocks(100, total_samples=100)))
+    # 13 bit codes of the single ended inputs, the Omega row stays below the top code
+    assert sim.sim_config.code_max == 2**12 - 1
+    assert block[0].max() < sim.sim_config.code_max
+
+
+def test_start_trigger_arms_only_when_asked_for():
+    with ni.daq_session(CHANNELS, 1000) as session:
+        ni.arm_trigger(session)
+        assert not session.armed
+    ni.initialize(start_trigger="PFI0")
+    with ni.daq_session(CHANNELS, 1000) as session:
+        ni.arm_trigger(session)
+        assert session.armed
+        ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, 0.5, session=session)
+        ni.update()
+        assert not session.armed
+    assert list(ni.ni_vars.all_trigger_index) == [0]
+
+
+def test_all_times_has_one_time_per_sample():
+    with ni.daq_session(CHANNELS, 1000) as session:
+        for duration in (1.0, 0.25):
+            ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, duration, session=session)
+            ni.update()
+    np.testing.assert_allclose(ni.all_times(), np.concatenate([np.arange(1000), np.arange(250)])/1000)
+    assert ni.ni_vars.all_time_base.shape == (2, 3)
+
+
+def test_float_spool_of_a_run_holds_volts(tmp_path):
+    path = os.path.join(tmp_path, "spool.bin")
+    ni.initialize(spool_path=path, spool_dtype="float32")
+    with ni.daq_session(CHANNELS, 1000) as session:
+        ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, 0.5, session=session)
+    ni.update()
+    ni.close_spool()
+    data, index = open_spool(path)
+    omega_voltage, mks_voltage = ni.all_voltages()
+    np.testing.assert_allclose(data[:, 0], omega_voltage, rtol=1e-6)
+    np.testing.assert_allclose(data[:, 1], mks_voltage, rtol=1e-6)
+
+
+def test_uncertainty_of_the_sensors_in_the_summary():
+    with ni.daq_session(CHANNELS, 1000) as session:
+        ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, 0.5, session=session)
+    ni.update()
+    channels = ni.ni_vars.summary_channels
+    assert channels == ni.SUMMARY_CHANNELS
+    omega = next(definition for definition in ni.ni_vars.sensors if definition.name == "omega")
+    expected = omega.uncertainty(np.array([ni.ni_vars.all_pressure_mean_omega[0]]))[0]
+    mean = ni.ni_vars.all_summary_mean[0]
+    assert mean[channels.index("omega_sigma_kpa")] == pytest.approx(expected, rel=1e-3)
+
+
+def test_devices_listed_with_their_serial_number():
+    device = sim.sim_config.devices[0]
+    assert ni.list_devices()[0]["serial_number"] == device["serial_num"]
+    assert ni.local_sys(serial_number=hex(device["serial_num"])) == device["name"]
+
+
+def test_multi_daq_session_needs_two_buffers():
+    with pytest.raises(ValueError):
+        ni.multi_daq_session({"Dev1": CHANNELS}, 1000, n_buffers=1)
+
+
+def test_psd_frequency_kept_once():
+    ni.initialize(psd_segment_length=256)
+    with ni.daq_session(CHANNELS, 1000) as session:
+        for _ in range(3):
+            ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, 1.0, session=session)
+            ni.update()
+    assert ni.ni_vars.psd_frequency.shape == (129,)
+    assert "all_psd_frequency" not in ni.ni_vars.stores
+    # a few setpoints of channels x bins, not a preallocation of 1024 rows
+    assert ni.ni_vars.all_psd.shape == (3, 2, 129)
+    assert ni.ni_vars.stores["all_psd"].nbytes <= ni.SETPOINT_CAPACITY*2*129*8
+
+
+def test_cycle_average_rounds_to_whole_mains_cycles():
+    assert ni.whole_cycle_samples(1000, 60) == (50, 3)
+    with ni.daq_session(CHANNELS, 1000) as session:
+        ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, 0.51, session=session)
+        assert ni.ni_vars.stats.count == 510
+        ni.initialize(cycle_average=True)
+        ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, 0.51, session=session)
+        assert ni.ni_vars.stats.count == 500
+
+
+def test_decimation_keeps_the_resolution_below_one_code():
+    codes = np.array([[0, 1, 1, 1, 2, 2, 2, 2]], dtype=np.int16)
+    sums = ni.decimate_codes(codes, 4)
+    np.testing.assert_array_equal(sums, [[3, 8]])
+    scaling = ni.decimated_scaling([[0.0, 0.5]], 4)
+    np.testing.assert_allclose(ni.codes_to_volts(sums[0], scaling[0]), [0.375, 1.0])
+
+
+def test_oversampled_read_keeps_the_averaged_codes():
+    with ni.daq_session(CHANNELS, 4000) as session:
+        ni.pressure_read(session.device_name, CHANNELS, "PFI0", 1000, 0.5, session=session, output_rate=1000)
+    ni.update()
+    assert ni.ni_vars.all_codes_omega.dtype == np.int32
+    omega_voltage = ni.all_voltages()[0]
+    assert len(omega_voltage) == 500
+    # the means of 4 codes fall between the codes
+    steps = omega_voltage/(20/2**13)
+    assert np.any(np.abs(steps - np.rint(steps)) > 0.1)
+
+
+def test_oversampling_only_when_asked_for():
+    assert ni.acquisition_rate(2, 1000, 1.0) == 1000
+    ni.initialize(oversample=True)
+    rate = ni.acquisition_rate(2, 1000, 1.0)
+    assert rate > 1000 and rate % 1000 == 0
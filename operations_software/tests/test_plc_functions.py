@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the regulator calibration and the PLC connection (plc_functions).
+"""
+import asyncio
+import os
+import socket
+import time
+import numpy as np
+import pytest
+import scipy.io
+from pyModbusTCP.server import ModbusServer
+import plc_functions as plc
+
+
+def test_regulator_calibration_keeps_the_first_of_repeated_voltages(tmp_path):
+    path = os.path.join(tmp_path, "cal.mat")
+    # down sweep then up sweep, the up sweep lags the down sweep
+    scipy.io.savemat(path, {"set_voltage": [40.0, 20.0, 0.0, 20.0, 40.0], 
+                            "mean_combined_kpa": [100.0, 50.0, 0.0, 55.0, 100.0]})
+    regulator = plc.regulator_calibration(path)
+    np.testing.assert_allclose(regulator.voltage_for([25.0, 50.0, 75.0]), [10.0, 20.0, 30.0])
+    assert regulator.pressure_for(30.0) == 75.0
+
+
+def test_regulator_calibration_read_again_only_when_the_file_changes(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "cal.mat")
+    scipy.io.savemat(path, {"set_voltage": [0.0, 100.0], "mean_combined_kpa": [0.0, 100.0]})
+    loads = []
+    loadmat = scipy.io.loadmat
+    monkeypatch.setattr(scipy.io, "loadmat", lambda p: loads.append(p) or loadmat(p))
+    regulator = plc.regulator_calibration(path)
+    regulator.voltage_for(10.0)
+    regulator.voltage_for(20.0)
+    assert len(loads) == 1
+
+    scipy.io.savemat(path, {"set_voltage": [0.0, 100.0], "mean_combined_kpa": [0.0, 200.0]})
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    assert regulator.voltage_for(100.0) == 50.0
+    assert len(loads) == 2
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_plc_client_reconnects_after_the_server_restarts():
+    port = _free_port()
+    server = ModbusServer(host="127.0.0.1", port=port, no_block=True)
+    server.start()
+    client = plc.plc_client(host="127.0.0.1", port=port, timeout=1.0, keepalive=None)
+    try:
+        assert client.write_single_register(0, 1234)
+        assert client.read_holding_registers(0) == [1234]
+        server.stop()
+        server = ModbusServer(host="127.0.0.1", port=port, no_block=True, data_bank=server.data_bank)
+        server.start()
+        # the old connection is dead, the request reconnects and is retried once
+        assert client.read_holding_registers(0) == [1234]
+    finally:
+        client.close()
+        server.stop()
+
+
+def test_batch_writes_consecutive_outputs_in_one_request(monkeypatch):
+    port = _free_port()
+    server = ModbusServer(host="127.0.0.1", port=port, no_block=True)
+    server.start()
+    client = plc.plc_client(host="127.0.0.1", port=port, timeout=1.0, keepalive=None)
+    monkeypatch.setattr(plc, "client", client)
+    requests = []
+    request = client.request
+    monkeypatch.setattr(client, "request", lambda function, *args: requests.append(function) or request(function, *args))
+    try:
+        with plc.plc_batch() as batch:
+            batch.ttl(plc.TTL_REGISTERS[0], "on")
+            batch.ttl(plc.TTL_REGISTERS[1], "on")
+            batch.contact("on")
+        assert requests == ["write_multiple_registers", "write_multiple_coils"]
+
+        state = plc.plc_snapshot()
+        assert state["ttl"] == {register: True for register in plc.TTL_REGISTERS}
+        assert state["contact"]
+    finally:
+        client.close()
+        server.stop()
+
+
+def test_pretrigger_actions_keep_their_own_deadlines():
+    fired = {}
+    start = time.monotonic()
+
+    async def slow_write():
+        fired["laser"] = time.monotonic() - start
+        await asyncio.to_thread(time.sleep, 0.15)   # a slow PLC write
+
+    def camera():
+        fired["camera"] = time.monotonic() - start
+
+    polled = plc.pretrigger(0.3, {0.2: slow_write, 0.1: camera}, poll=lambda: 1, poll_interval=0.1)
+    assert abs(fired["laser"] - 0.1) < 0.05
+    # the camera is not held up by the laser write still running
+    assert abs(fired["camera"] - 0.2) < 0.05
+    assert [value for _, value in polled] == [1, 1, 1]
+
+
+def test_pretrigger_inside_a_running_event_loop():
+    async def console():
+        return plc.pretrigger(0.05, {}, poll=lambda: "reading", poll_interval=0.1)
+    assert asyncio.run(console()) == [(pytest.approx(0, abs=0.05), "reading")]
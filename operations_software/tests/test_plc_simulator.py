@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the simulated PLC and regulator (plc_simulator).
+"""
+import socket
+import numpy as np
+import plc_functions as plc
+import plc_simulator
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_regulator_settles_at_the_calibrated_pressure():
+    regulator = plc_simulator.regulator_model(time_constant=1.0)
+    voltage = float(plc.regulator.voltage_for(50.0))
+    regulator.set_voltage(voltage, t=0.0)
+    assert regulator.pressure(0.0) == 95.0
+    # the down branch is the one plc_functions.regulator is made from
+    np.testing.assert_allclose(regulator.pressure(20.0), 50.0, atol=0.5)
+
+
+def test_regulator_holds_its_pressure_between_the_branches():
+    regulator = plc_simulator.regulator_model()
+    down = np.interp(30.0, *regulator.down)
+    up = np.interp(30.0, *regulator.up)
+    middle = (down + up)/2
+    assert regulator.steady_pressure(30.0, middle) == middle
+    assert regulator.steady_pressure(30.0, 200.0) == max(down, up)
+
+
+def test_pressure_written_through_plc_functions_drives_the_regulator():
+    with plc_simulator.plc_simulator(port=_free_port()) as simulator:
+        plc.set_pressure(50.0)
+        assert simulator.events[-1][1:3] == ("register", plc.REGULATOR_REGISTER)
+        np.testing.assert_allclose(simulator.regulator.voltage, plc.get_set_voltage(50.0), atol=1e-3)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the running statistics (stats_functions).
+"""
+import numpy as np
+import pytest
+from scipy.signal import welch
+from stats_functions import welch_psd
+
+
+def test_welch_psd_matches_scipy_over_uneven_blocks():
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((2, 10000))
+    psd = welch_psd(2, 1000, 256)
+    for start in range(0, data.shape[1], 137):
+        psd.update(data[:, start:start + 137])
+    frequency, expected = welch(data, 1000, nperseg=256)
+    np.testing.assert_allclose(psd.frequency, frequency)
+    np.testing.assert_allclose(psd.psd, expected)
+
+
+def test_line_rms_of_a_sine():
+    t = np.arange(20000)/1000
+    psd = welch_psd(1, 1000, 1000)
+    psd.update(3.0 + 0.01*np.sin(2*np.pi*60*t))
+    assert psd.noise_summary(60.0)["line_rms"][0] == pytest.approx(0.01/np.sqrt(2), rel=0.02)
+
+
+def test_coarse_resolution_does_not_report_the_offset_as_line_pickup():
+    # 256 samples at 24 kS/s: 94 Hz bins, the 60 Hz bins would reach the DC bin
+    rng = np.random.default_rng(1)
+    psd = welch_psd(1, 24000, 256)
+    psd.update(5.0 + 1e-3*rng.standard_normal(24000))
+    with pytest.warns(UserWarning):
+        summary = psd.noise_summary(60.0)
+    assert np.isnan(summary["line_rms"][0])
+    assert summary["noise_rms"][0] == pytest.approx(1e-3, rel=0.1)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the run storage (storage_functions).
+"""
+import os
+import numpy as np
+import pytest
+from storage_functions import raw_spool, open_spool
+
+
+def test_spool_round_trip_past_its_capacity(tmp_path):
+    path = os.path.join(tmp_path, "spool.bin")
+    blocks = [np.random.default_rng(seed).standard_normal((2, 70)) for seed in range(3)]
+    spool = raw_spool(path, ["omega", "mks"], 1000, capacity=100)
+    spool.append(blocks[0])
+    spool.mark_setpoint(0)
+    spool.append(blocks[1])
+    spool.append(blocks[2])
+    spool.mark_setpoint(70)
+    spool.close()
+
+    data, index = open_spool(path)
+    assert data.shape == (210, 2)
+    assert index["setpoints"] == [[0, 70], [70, 210]]
+    np.testing.assert_allclose(data, np.concatenate(blocks, axis=1).T.astype(np.float32))
+
+
+def test_codes_spooled_to_a_float_file_are_volts(tmp_path):
+    path = os.path.join(tmp_path, "spool.bin")
+    scaling = [[0.0, 0.5], [1.0, 2.0]]
+    codes = np.array([[0, 10, 2018], [-4, 0, 4]], dtype=np.int16)
+    spool = raw_spool(path, ["omega", "mks"], 1000, dtype="float32", scaling=scaling)
+    spool.append(codes)
+    spool.close()
+
+    data, index = open_spool(path)
+    np.testing.assert_allclose(data.T, [[0.0, 5.0, 1009.0], [-7.0, 1.0, 9.0]])
+    assert index["scaling"] is None
+
+
+def test_codes_need_the_scaling_for_a_float_file(tmp_path):
+    spool = raw_spool(os.path.join(tmp_path, "spool.bin"), ["omega"], 1000, dtype="float32")
+    with pytest.raises(ValueError):
+        spool.append(np.zeros((1, 10), dtype=np.int16))
+    spool.close()
+
+
+def test_int16_spool_keeps_the_codes_and_the_scaling(tmp_path):
+    path = os.path.join(tmp_path, "spool.bin")
+    codes = np.array([[0, 10, 2018]], dtype=np.int16)
+    spool = raw_spool(path, ["omega"], 1000, dtype="int16", scaling=[[0.0, 0.5]])
+    spool.append(codes)
+    spool.close()
+
+    data, index = open_spool(path)
+    np.testing.assert_array_equal(data.T, codes)
+    assert index["scaling"] == [[0.0, 0.5]]